@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Check whether many docker tags exist in ECR with a few batched API calls.
+
+The (repository, tag) pairs are grouped per repository and looked up with
+BatchGetImage, up to 100 tags per call, with the repositories queried
+concurrently. Tags found are remembered in a cache file for the rest of the
+job, since an immutable tag never disappears once pushed.
+
+boto3 is used when it is installed, otherwise the calls go through the AWS CLI
+preinstalled on the runners, so the action needs no Python setup.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class AwsCliError(Exception):
+    pass
+
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+    ClientError = AwsCliError
+
+
+DEFAULT_REGION = 'eu-central-1'
+
+# BatchGetImage accepts at most 100 image ids per call
+BATCH_SIZE = 100
+
+CHECK_WORKERS = 8
+
+MANIFEST_MEDIA_TYPES = [
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.oci.image.index.v1+json',
+]
+
+
+@dataclass(frozen=True)
+class ImageRef:
+    repository: str
+    tag: str
+
+    def __str__(self) -> str:
+        return f"{self.repository}:{self.tag}"
+
+
+def _repository_name(repository: str) -> str:
+    """Accept both a plain repository name and the '{"repository": <name>}' form."""
+    try:
+        parsed = json.loads(repository)
+    except ValueError:
+        return repository.strip()
+    if isinstance(parsed, dict) and 'repository' in parsed:
+        return parsed['repository']
+    return repository.strip()
+
+
+def parse_images(images: str) -> List[ImageRef]:
+    """
+    Parse a JSON list of {"repository", "tag"} objects or one 'repository:tag'
+    per line or separated by spaces.
+    """
+    images = images.strip()
+    refs = []
+    if images.startswith('['):
+        for item in json.loads(images):
+            repository = item['repository']
+            if isinstance(repository, dict):
+                repository = repository['repository']
+            refs.append(ImageRef(repository, item['tag']))
+        return refs
+
+    for image in images.split():
+        repository, _, tag = image.rpartition(':')
+        if not repository or not tag:
+            raise ValueError(f"Image '{image}' is not in repository:tag form")
+        refs.append(ImageRef(repository, tag))
+    return refs
+
+
+class TagCache:
+    """
+    Tags known to exist, kept in a JSON file for the duration of a workflow run.
+    """
+
+    def __init__(self, path: Optional[Path], scope: str):
+        self.path = path
+        self.scope = scope
+        self.known: Set[str] = set()
+        if path and path.exists():
+            try:
+                self.known = set(json.loads(path.read_text()).get(scope, []))
+            except ValueError:
+                pass
+
+    def __contains__(self, image: ImageRef) -> bool:
+        return str(image) in self.known
+
+    def add(self, images: Iterable[ImageRef]) -> None:
+        self.known.update(str(image) for image in images)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        data = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+            except ValueError:
+                pass
+        data[self.scope] = sorted(self.known)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_name, self.path)
+
+
+class AwsCliEcr:
+    """
+    The batch_get_image call of the boto3 ECR client, run with the AWS CLI.
+    """
+
+    def __init__(self, region: str, endpoint_url: Optional[str] = None):
+        self.region = region
+        self.endpoint_url = endpoint_url
+
+    def batch_get_image(self, repositoryName: str, imageIds: List[Dict[str, str]],
+                        acceptedMediaTypes: List[str], registryId: Optional[str] = None) -> Dict:
+        command = ['aws', 'ecr', 'batch-get-image', '--output', 'json', '--region', self.region,
+                   '--repository-name', repositoryName,
+                   '--image-ids', json.dumps(imageIds),
+                   '--accepted-media-types', *acceptedMediaTypes,
+                   # Manifests are not needed, only which tags were found
+                   '--query', '{images: images[].{imageId: imageId}, failures: failures}']
+        if registryId:
+            command += ['--registry-id', registryId]
+        if self.endpoint_url:
+            command += ['--endpoint-url', self.endpoint_url]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise AwsCliError(result.stderr.strip())
+        return json.loads(result.stdout)
+
+
+def ecr_client(region: str, endpoint_url: Optional[str] = None, client: str = 'auto'):
+    """Return a boto3 ECR client when boto3 is installed, the AWS CLI otherwise."""
+    if client == 'boto3' or (client == 'auto' and boto3 is not None):
+        return boto3.client('ecr', region_name=region, endpoint_url=endpoint_url)
+    return AwsCliEcr(region, endpoint_url)
+
+
+def _existing_tags(client, repository: str, tags: List[str], registry_id: Optional[str]) -> Set[str]:
+    found: Set[str] = set()
+    for start in range(0, len(tags), BATCH_SIZE):
+        batch = tags[start:start + BATCH_SIZE]
+        params = {
+            'repositoryName': repository,
+            'imageIds': [{'imageTag': tag} for tag in batch],
+            'acceptedMediaTypes': MANIFEST_MEDIA_TYPES,
+        }
+        if registry_id:
+            params['registryId'] = registry_id
+        try:
+            response = client.batch_get_image(**params)
+        except (ClientError, AwsCliError) as e:
+            print(f"Could not look up tags of {repository}: {e}")
+            return found
+        for failure in response.get('failures', []):
+            if failure.get('failureCode') != 'ImageNotFound':
+                print(f"Could not look up {repository}:{failure['imageId'].get('imageTag')}: "
+                      f"{failure.get('failureReason')}")
+        found.update(image['imageId']['imageTag'] for image in response.get('images', []))
+    return found
+
+
+def check_tags(images: List[ImageRef], client, registry_id: Optional[str] = None,
+               cache: Optional[TagCache] = None, workers: int = CHECK_WORKERS) -> Dict[str, bool]:
+    """
+    Return for every image whether its tag exists in ECR, in input order.
+    Images already in the cache are not looked up again.
+    """
+    cache = cache or TagCache(None, '')
+    groups: Dict[str, List[str]] = {}
+    for image in dict.fromkeys(images):
+        if image not in cache:
+            groups.setdefault(image.repository, []).append(image.tag)
+
+    def lookup(repository: str) -> List[ImageRef]:
+        return [ImageRef(repository, tag) for tag in _existing_tags(client, repository, groups[repository],
+                                                                    registry_id)]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for found in executor.map(lookup, groups):
+            cache.add(found)
+
+    cache.save()
+    return {str(image): image in cache for image in images}
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Check whether docker tags exist in ECR')
+    parser.add_argument('--images', default='',
+                        help='JSON list of {"repository", "tag"} objects or repository:tag entries')
+    parser.add_argument('--repository', help='Single repository name, plain or as {"repository": <name>}')
+    parser.add_argument('--tag', help='Tag to check in --repository')
+    parser.add_argument('--registry', default='',
+                        help='ECR registry URI, <account>.dkr.ecr.<region>.amazonaws.com, defaults to the caller\'s')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', DEFAULT_REGION))
+    parser.add_argument('--cache-file', type=Path, help='Cache of existing tags shared by the steps of a run')
+    parser.add_argument('--endpoint-url', help='ECR endpoint, for testing against a local stand-in')
+    parser.add_argument('--workers', type=int, default=CHECK_WORKERS)
+    parser.add_argument('--client', choices=['auto', 'boto3', 'cli'], default='auto',
+                        help='boto3 when installed or the AWS CLI (auto), or force one of them')
+    args = parser.parse_args(argv[1:])
+
+    images = parse_images(args.images) if args.images.strip() else []
+    if args.repository and args.tag:
+        images.append(ImageRef(_repository_name(args.repository), args.tag))
+    if not images:
+        parser.error('no images given, use --images or --repository and --tag')
+
+    registry_id = None
+    region = args.region
+    if args.registry:
+        host = args.registry.split('/')[0]
+        registry_id = host.split('.')[0]
+        if '.dkr.ecr.' in host:
+            region = host.split('.dkr.ecr.')[1].split('.')[0]
+
+    client = ecr_client(region, args.endpoint_url, args.client)
+    cache = TagCache(args.cache_file, f"{registry_id or 'default'}/{region}")
+    results = check_tags(images, client, registry_id, cache, args.workers)
+
+    for image, exists in results.items():
+        print(f"{image}: {'exists' if exists else 'missing'}")
+
+    outputs = {
+        'results': json.dumps(results, separators=(',', ':')),
+        'all_exist': str(all(results.values())).lower(),
+    }
+    if len(results) == 1:
+        outputs['tag_already_exists'] = str(next(iter(results.values()))).lower()
+
+    lines = ''.join(f"{key}={value}\n" for key, value in outputs.items())
+    for env_file in ('GITHUB_STEP_SUMMARY', 'GITHUB_OUTPUT'):
+        if os.environ.get(env_file):
+            with open(os.environ[env_file], 'a') as f:
+                f.write(lines)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,199 @@
+import json
+import os
+import sys
+import tempfile
+import textwrap
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import boto3
+
+from check_docker_tags import AwsCliEcr, ImageRef, TagCache, check_tags, main, parse_images
+
+REGISTRY_ID = "123456789012"
+
+# Tags present in the stand-in registry, per repository
+REGISTRY = {
+    "payments": {"1.0.0", "1.1.0"},
+    "billing": {"2.0.0"},
+}
+
+# Stand-in for the AWS CLI: answers batch-get-image from REGISTRY and appends
+# every call to the log file next to it
+FAKE_AWS = textwrap.dedent(f"""\
+    #!{sys.executable}
+    import json
+    import sys
+    from pathlib import Path
+    registry = {json.dumps({name: sorted(tags) for name, tags in REGISTRY.items()})}
+    args = sys.argv[1:]
+    option = lambda name: args[args.index(name) + 1]
+    with open(Path(__file__).parent / 'calls.log', 'a') as log:
+        log.write(json.dumps(args) + '\\n')
+    repository = option('--repository-name')
+    if repository not in registry:
+        print(f'An error occurred (RepositoryNotFoundException): {{repository}}', file=sys.stderr)
+        sys.exit(254)
+    ids = json.loads(option('--image-ids'))
+    print(json.dumps({{
+        'images': [{{'imageId': i}} for i in ids if i['imageTag'] in registry[repository]],
+        'failures': [{{'imageId': i, 'failureCode': 'ImageNotFound'}} for i in ids
+                     if i['imageTag'] not in registry[repository]],
+    }}))
+    """)
+
+
+class EcrHandler(BaseHTTPRequestHandler):
+    """Stand-in for the ECR JSON API, only implementing BatchGetImage."""
+
+    def do_POST(self):
+        target = self.headers.get('X-Amz-Target', '')
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.calls.append((target.split('.')[-1], body))
+
+        repository = body['repositoryName']
+        if repository not in REGISTRY:
+            self._respond(400, {"__type": "RepositoryNotFoundException",
+                                "message": f"The repository '{repository}' does not exist"})
+            return
+
+        images, failures = [], []
+        for image_id in body['imageIds']:
+            if image_id['imageTag'] in REGISTRY[repository]:
+                images.append({"registryId": REGISTRY_ID, "repositoryName": repository, "imageId": image_id,
+                               "imageManifest": "{}"})
+            else:
+                failures.append({"imageId": image_id, "failureCode": "ImageNotFound",
+                                 "failureReason": "Requested image not found"})
+        self._respond(200, {"images": images, "failures": failures})
+
+    def _respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCheckDockerTags(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), EcrHandler)
+        self.server.calls = []
+        thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+
+        patcher = patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = boto3.client('ecr', region_name='eu-central-1', endpoint_url=self.endpoint)
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_file = Path(self.tmp.name) / "ecr-tags.json"
+
+    def test_parse_images(self):
+        self.assertEqual(parse_images("payments:1.0.0\nbilling:2.0.0"),
+                         [ImageRef("payments", "1.0.0"), ImageRef("billing", "2.0.0")])
+        self.assertEqual(parse_images('[{"repository": {"repository": "team/app"}, "tag": "v1"}]'),
+                         [ImageRef("team/app", "v1")])
+        with self.assertRaises(ValueError):
+            parse_images("payments")
+
+    def test_one_call_per_repository(self):
+        images = [ImageRef("payments", "1.0.0"), ImageRef("billing", "2.0.0"), ImageRef("payments", "9.9.9"),
+                  ImageRef("billing", "2.0.0")]
+
+        results = check_tags(images, self.client, REGISTRY_ID)
+
+        self.assertEqual(results, {"payments:1.0.0": True, "billing:2.0.0": True, "payments:9.9.9": False})
+        self.assertEqual(sorted((call, body['repositoryName'], len(body['imageIds']))
+                                for call, body in self.server.calls),
+                         [("BatchGetImage", "billing", 1), ("BatchGetImage", "payments", 2)])
+        self.assertTrue(all(body['registryId'] == REGISTRY_ID for _, body in self.server.calls))
+
+    def test_large_groups_are_split_in_batches(self):
+        images = [ImageRef("payments", f"0.0.{index}") for index in range(250)]
+        check_tags(images, self.client)
+        self.assertEqual([len(body['imageIds']) for _, body in self.server.calls], [100, 100, 50])
+
+    def test_missing_repository_reports_false(self):
+        self.assertEqual(check_tags([ImageRef("unknown", "1.0.0")], self.client), {"unknown:1.0.0": False})
+
+    def test_only_positive_results_are_cached(self):
+        images = [ImageRef("payments", "1.0.0"), ImageRef("payments", "2.0.0")]
+        check_tags(images, self.client, cache=TagCache(self.cache_file, "default"))
+        self.server.calls.clear()
+
+        results = check_tags(images, self.client, cache=TagCache(self.cache_file, "default"))
+
+        self.assertEqual(results, {"payments:1.0.0": True, "payments:2.0.0": False})
+        self.assertEqual([body['imageIds'] for _, body in self.server.calls], [[{"imageTag": "2.0.0"}]])
+
+    def test_main_writes_outputs(self):
+        output = Path(self.tmp.name) / "output"
+        with patch.dict(os.environ, {'GITHUB_OUTPUT': str(output)}):
+            main(['check_docker_tags.py', '--repository', '{"repository": "payments"}', '--tag', '1.1.0',
+                  '--registry', f"{REGISTRY_ID}.dkr.ecr.eu-central-1.amazonaws.com",
+                  '--endpoint-url', self.endpoint, '--cache-file', str(self.cache_file)])
+
+        self.assertEqual(output.read_text().splitlines(), [
+            'results={"payments:1.1.0":true}',
+            'all_exist=true',
+            'tag_already_exists=true',
+        ])
+
+
+class TestAwsCliEcr(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        bin_dir = Path(self.tmp.name) / "bin"
+        bin_dir.mkdir()
+        aws = bin_dir / "aws"
+        aws.write_text(FAKE_AWS)
+        aws.chmod(0o755)
+        self.log = bin_dir / "calls.log"
+        patcher = patch.dict(os.environ, {'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _calls(self):
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def test_one_cli_call_per_repository(self):
+        images = [ImageRef("payments", "1.0.0"), ImageRef("payments", "9.9.9"), ImageRef("billing", "2.0.0"),
+                  ImageRef("unknown", "1.0.0")]
+
+        results = check_tags(images, AwsCliEcr("eu-central-1"), REGISTRY_ID)
+
+        self.assertEqual(results, {"payments:1.0.0": True, "payments:9.9.9": False, "billing:2.0.0": True,
+                                   "unknown:1.0.0": False})
+        calls = self._calls()
+        self.assertEqual(sorted(call[call.index('--repository-name') + 1] for call in calls),
+                         ["billing", "payments", "unknown"])
+        self.assertTrue(all(call[call.index('--registry-id') + 1] == REGISTRY_ID for call in calls))
+
+    def test_main_uses_cli(self):
+        output = Path(self.tmp.name) / "output"
+        with patch.dict(os.environ, {'GITHUB_OUTPUT': str(output)}):
+            main(['check_docker_tags.py', '--images', 'payments:1.1.0 billing:1.0.0', '--client', 'cli'])
+
+        self.assertEqual(output.read_text().splitlines(), [
+            'results={"payments:1.1.0":true,"billing:1.0.0":false}',
+            'all_exist=false',
+        ])
+        self.assertEqual(len(self._calls()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for copy_environment.py on synthetic overlay trees.
+
+Generates kustomize-like directory trees with a configurable number of files,
+nesting depth, '_template'/'_region' directories and template size, runs the
+environment sync on them and reports the median time of every phase.
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from copy_environment import SyncProfile, copy_and_rename_environment
+
+BENCH_ENV_TYPE = "bench"
+BENCH_REGION = "eu-central-1"
+
+
+@dataclass
+class Scenario:
+    name: str
+    template_dirs: int
+    files_per_template: int
+    depth: int = 1
+    region_dirs: int = 0
+    template_size: int = 1024
+    existing_env: bool = False
+
+
+DEFAULT_SCENARIOS: List[Scenario] = [
+    Scenario("small", template_dirs=10, files_per_template=5),
+    Scenario("many-files", template_dirs=50, files_per_template=40),
+    Scenario("deep", template_dirs=20, files_per_template=5, depth=8),
+    Scenario("regions", template_dirs=50, files_per_template=10, region_dirs=50),
+    Scenario("large-templates", template_dirs=5, files_per_template=2, template_size=4 * 1024 * 1024),
+    Scenario("existing-env", template_dirs=50, files_per_template=10, existing_env=True),
+]
+
+
+def _template_content(size: int) -> str:
+    line = "  key: ${environment_type}-$aws_region-${MISSING:-default}\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def generate_overlay_tree(root: Path, scenario: Scenario) -> None:
+    """
+    Create a synthetic overlay tree for the scenario below root.
+
+    Every '_template' directory sits in its own service at the configured
+    depth. The first region_dirs of them get a nested '_region' directory that
+    receives half of the template files.
+    """
+    content = _template_content(scenario.template_size)
+    for service in range(scenario.template_dirs):
+        overlays = root / f"service-{service}"
+        for level in range(scenario.depth):
+            overlays = overlays / f"level-{level}"
+        overlays = overlays / "overlays"
+
+        template_dir = overlays / "_template"
+        region_dir = template_dir / "_region" if service < scenario.region_dirs else None
+        template_dir.mkdir(parents=True)
+        if region_dir:
+            region_dir.mkdir()
+        (overlays / "kustomization.yaml").write_text("resources:\n  - ../base\n")
+
+        for index in range(scenario.files_per_template):
+            target = region_dir if region_dir and index % 2 else template_dir
+            (target / f"resource-{index}.yaml").write_text(content)
+
+        if scenario.existing_env:
+            existing = overlays / BENCH_ENV_TYPE
+            existing.mkdir()
+            (existing / "legacy.yaml").write_text("legacy: true\n")
+
+
+def run_scenario(scenario: Scenario, repeat: int) -> List[SyncProfile]:
+    profiles: List[SyncProfile] = []
+    for run in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            # copy_environment stages into /tmp/<dir name>, keep it unique per run
+            root = Path(workdir) / f"bench-{scenario.name}-{os.getpid()}-{run}"
+            generate_overlay_tree(root, scenario)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                profiles.append(copy_and_rename_environment(str(root), BENCH_ENV_TYPE, BENCH_REGION))
+    return profiles
+
+
+def median_phases(profiles: List[SyncProfile]) -> Dict[str, float]:
+    phases: Dict[str, List[float]] = {}
+    for profile in profiles:
+        for name, stats in profile.phases.items():
+            phases.setdefault(name, []).append(stats.seconds)
+    return {name: statistics.median(values) for name, values in phases.items()}
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark copy_environment.py on synthetic overlay trees')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario, the median is reported')
+    parser.add_argument('--scenario', action='append', default=[],
+                        help='Only run the named default scenario, can be given multiple times')
+    parser.add_argument('--template-dirs', type=int, help='Run a custom scenario with this many _template dirs')
+    parser.add_argument('--files-per-template', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--region-dirs', type=int, default=0)
+    parser.add_argument('--template-size', type=int, default=1024, help='Size of every template file in bytes')
+    parser.add_argument('--existing-env', action='store_true',
+                        help='Pre-create the target environment directories to exercise the merge path')
+    args = parser.parse_args(argv[1:])
+
+    if args.template_dirs is not None:
+        scenarios = [Scenario("custom", args.template_dirs, args.files_per_template, args.depth,
+                              args.region_dirs, args.template_size, args.existing_env)]
+    elif args.scenario:
+        scenarios = [s for s in DEFAULT_SCENARIOS if s.name in args.scenario]
+    else:
+        scenarios = DEFAULT_SCENARIOS
+
+    os.environ['environment_type'] = BENCH_ENV_TYPE
+    os.environ['aws_region'] = BENCH_REGION
+
+    for scenario in scenarios:
+        profiles = run_scenario(scenario, args.repeat)
+        medians = median_phases(profiles)
+        print(f"\n=== {scenario} ===")
+        last = profiles[-1]
+        print(f"{'Phase':<18}{'Median s':>10}{'Files':>10}{'Bytes':>14}")
+        for name, seconds in medians.items():
+            stats = last.phases[name]
+            print(f"{name:<18}{seconds:>10.3f}{stats.files:>10}{stats.bytes:>14}")
+        print(f"{'total':<18}{sum(medians.values()):>10.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -4,12 +4,283 @@ Script to copy an environment directory and rename all 'env' subdirectories
 to a new environment name.
 """
 
+import filecmp
 import os
+import re
 import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from shutil import move
+from typing import Dict, Iterator, List
 from envsubst import envsubst
-def copy_and_rename_environment(source_dir: str, new_env_type: str | None, new_env_region: str | None) -> None:
+
+# Number of characters read from a template per substitution pass
+RENDER_CHUNK_SIZE = 64 * 1024
+
+# Upper bound for text held back while waiting for an unterminated token
+# to close; beyond this the text is flushed as-is, as envsubst would leave it
+MAX_TOKEN_CARRY = 1024 * 1024
+
+# Number of top-level subtrees merged concurrently into an existing directory
+MERGE_WORKERS = min(8, os.cpu_count() or 1)
+
+_trailing_simple_var_re = re.compile(r'\$[A-Za-z0-9_]*\Z')
+
+
+def _safe_split_index(buffer: str) -> int:
+    """
+    Return the index up to which the buffer can be substituted without
+    cutting a variable token in half. Everything from the index onwards
+    has to be carried over into the next chunk.
+    """
+    split = len(buffer)
+
+    # An opened '${' that is not closed yet, including '${VAR:-default' forms
+    last_close = buffer.rfind('}')
+    open_index = buffer.find('${', last_close + 1)
+    if open_index != -1:
+        split = open_index
+
+    # A '$VAR' running up to the end of the buffer may continue in the next chunk
+    match = _trailing_simple_var_re.search(buffer)
+    if match and match.start() < split:
+        split = match.start()
+
+    # Keep an escaping backslash together with the '$' it escapes
+    if split > 0 and buffer[split - 1] == '\\':
+        split -= 1
+
+    return split
+
+
+def render_template_file(file_path: Path, chunk_size: int = RENDER_CHUNK_SIZE) -> None:
+    """
+    Substitute environment variables in a template file in place.
+
+    The file is streamed in chunks so memory use does not depend on the file
+    size. Tokens crossing a chunk boundary are carried over to the next chunk.
+    The result is written to a temporary file next to the template and moved
+    over it with os.replace, so the template is never left half-written.
+
+    Args:
+        file_path: Path to the template file to render
+        chunk_size: Number of characters to read per chunk
+    """
+    fd, temp_name = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with open(file_path, 'r', encoding='utf-8', newline='') as source, \
+                os.fdopen(fd, 'w', encoding='utf-8', newline='') as target:
+            carry = ''
+            while chunk := source.read(chunk_size):
+                buffer = carry + chunk
+                split = _safe_split_index(buffer)
+                if len(buffer) - split > MAX_TOKEN_CARRY:
+                    split = len(buffer)
+                target.write(envsubst(buffer[:split]))
+                carry = buffer[split:]
+            if carry:
+                target.write(envsubst(carry))
+
+        shutil.copymode(file_path, temp_name)
+        os.replace(temp_name, file_path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class MergeSummary:
+    """
+    Outcome of merging a directory into an existing one.
+    """
+    new: int = 0
+    identical: int = 0
+    changed: int = 0
+    bytes: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def update(self, other: 'MergeSummary') -> None:
+        self.new += other.new
+        self.identical += other.identical
+        self.changed += other.changed
+        self.bytes += other.bytes
+        self.errors.extend(other.errors)
+
+    def __str__(self) -> str:
+        return (f"{self.new} new, {self.identical} identical, {self.changed} changed, "
+                f"{len(self.errors)} errors")
+
+
+def _index_files(root: Path) -> Dict[str, int]:
+    """Map the relative path of every file and symlink below root to its size."""
+    index: Dict[str, int] = {}
+    for dirpath, dirs, files in os.walk(root):
+        links = [name for name in dirs if os.path.islink(os.path.join(dirpath, name))]
+        for name in files + links:
+            path = os.path.join(dirpath, name)
+            index[os.path.relpath(path, root)] = os.lstat(path).st_size
+    return index
+
+
+def _is_identical(source: Path, destination: Path, destination_size: int) -> bool:
+    if source.is_symlink() or destination.is_symlink():
+        return (source.is_symlink() and destination.is_symlink()
+                and os.readlink(source) == os.readlink(destination))
+    return (source.lstat().st_size == destination_size
+            and filecmp.cmp(source, destination, shallow=False))
+
+
+def _copy_atomic(source: Path, destination: Path) -> None:
+    """Copy source next to destination and rename it into place, so readers never see a partial file."""
+    fd, temp_name = tempfile.mkstemp(dir=destination.parent, prefix=f".{destination.name}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        if source.is_symlink():
+            os.unlink(temp_name)
+            os.symlink(os.readlink(source), temp_name)
+        else:
+            shutil.copy2(source, temp_name)
+        os.replace(temp_name, destination)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def _merge_file(source: Path, destination: Path, relative: str, index: Dict[str, int],
+                summary: MergeSummary, move: bool) -> None:
+    try:
+        size = index.get(relative)
+        if size is not None and _is_identical(source, destination, size):
+            if move:
+                source.unlink()
+            summary.identical += 1
+            return
+        summary.bytes += source.lstat().st_size
+        if move:
+            os.replace(source, destination)
+        else:
+            _copy_atomic(source, destination)
+        if size is None:
+            summary.new += 1
+        else:
+            summary.changed += 1
+    except OSError as e:
+        summary.errors.append(f"{relative}: {e}")
+
+
+def _merge_entry(source_root: Path, destination_root: Path, entry: str, index: Dict[str, int],
+                 move: bool) -> MergeSummary:
+    """Merge one top-level entry of source_root, a file or a whole subtree, into destination_root."""
+    summary = MergeSummary()
+    source = source_root / entry
+    if not source.is_dir() or source.is_symlink():
+        _merge_file(source, destination_root / entry, entry, index, summary, move)
+        return summary
+
+    for dirpath, dirs, files in os.walk(source):
+        dirs.sort()
+        relative_dir = os.path.relpath(dirpath, source_root)
+        try:
+            (destination_root / relative_dir).mkdir(exist_ok=True)
+        except OSError as e:
+            summary.errors.append(f"{relative_dir}: {e}")
+            dirs.clear()
+            continue
+
+        links = [name for name in dirs if os.path.islink(os.path.join(dirpath, name))]
+        dirs[:] = [name for name in dirs if name not in links]
+        for name in sorted(files + links):
+            relative = os.path.join(relative_dir, name)
+            _merge_file(source_root / relative, destination_root / relative, relative, index, summary, move)
+    return summary
+
+
+def merge_directory(source: Path, destination: Path, workers: int = MERGE_WORKERS,
+                    move: bool = True) -> MergeSummary:
+    """
+    Merge the contents of source into the existing destination directory.
+
+    The destination is indexed once up front. Every source file is then
+    classified against the index: files identical to the destination are
+    left alone, new and changed files atomically replace the destination
+    path. Top-level subtrees are merged concurrently.
+
+    Args:
+        source: Directory whose contents are merged
+        destination: Existing directory to merge into
+        workers: Number of subtrees merged concurrently
+        move: Rename source files into place and remove the source directory
+            afterwards, source and destination must be on the same filesystem.
+            Otherwise files are copied and the source is kept. The source is
+            also kept when errors occur, with the entries that failed to merge.
+
+    Returns:
+        Counts of new, identical and changed files and the errors encountered
+    """
+    index = _index_files(destination)
+    entries = sorted(os.listdir(source))
+
+    summary = MergeSummary()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(lambda entry: _merge_entry(source, destination, entry, index, move), entries):
+            summary.update(result)
+
+    if move and not summary.errors:
+        shutil.rmtree(source)
+    return summary
+
+
+@dataclass
+class PhaseStats:
+    name: str
+    seconds: float = 0.0
+    files: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class SyncProfile:
+    """
+    Wall-clock time and file/byte counts for each phase of an environment sync.
+    """
+    phases: Dict[str, PhaseStats] = field(default_factory=dict)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseStats]:
+        stats = self.phases.setdefault(name, PhaseStats(name))
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(stats.seconds for stats in self.phases.values())
+
+    def report(self) -> str:
+        lines = [f"{'Phase':<18}{'Seconds':>10}{'Files':>10}{'Bytes':>14}"]
+        for stats in self.phases.values():
+            lines.append(f"{stats.name:<18}{stats.seconds:>10.3f}{stats.files:>10}{stats.bytes:>14}")
+        lines.append(f"{'total':<18}{self.total_seconds:>10.3f}")
+        return "\n".join(lines)
+
+
+def _counting_copy(stats: PhaseStats):
+    """Return a copytree copy_function that counts copied files and bytes."""
+    def copy(src: str, dst: str) -> str:
+        result = shutil.copy2(src, dst)
+        stats.files += 1
+        stats.bytes += os.path.getsize(result)
+        return result
+    return copy
+
+
+def copy_and_rename_environment(source_dir: str, new_env_type: str | None, new_env_region: str | None,
+                                profile: SyncProfile | None = None) -> SyncProfile:
     """
     Copy a source directory to a destination and rename all 'env' subdirectories
     to the new environment name.
@@ -18,6 +289,10 @@ def copy_and_rename_environment(source_dir: str, new_env_type: str | None, new_e
         source_dir: Path to the source directory to template and copy
         new_env_type: New environment type for all 'env' subdirectories
         new_env_region: New environment region for all 'env' subdirectories
+        profile: Profile to record per-phase timings into, a new one is created if omitted
+
+    Returns:
+        The profile with timings and file/byte counts of every phase
         
     Raises:
         ValueError: If new_env_type or new_env_region is not provided
@@ -36,90 +311,120 @@ def copy_and_rename_environment(source_dir: str, new_env_type: str | None, new_e
     if not new_env_region:
         raise ValueError("New environment region is not provided or is empty.")
 
+    profile = profile if profile is not None else SyncProfile()
+
     # Create a temporary copy to avoid partial copies in case of errors
     # and to stage the files for templating
-    temp_path = Path(f"/tmp/{path.relative_to(path.parent)}").resolve()    
-    shutil.copytree(path, temp_path)
+    temp_path = Path(f"/tmp/{path.relative_to(path.parent)}").resolve()
+    with profile.phase("temp copy") as stats:
+        shutil.copytree(path, temp_path, copy_function=_counting_copy(stats))
 
     print(f"Find all template files and substitute variables...")
-    for root, dirs, files in os.walk(temp_path):
-        dir = Path(root)
-        for file in files:
-            file_path = dir / file
+    with profile.phase("templating") as stats:
+        for root, dirs, files in os.walk(temp_path):
+            dir = Path(root)
+            for file in files:
+                file_path = dir / file
 
-            if "_template" in str(file_path):
-                try:
-                    print(f"Processing file: {file_path}")
-                    file_template = file_path.read_text()
-                
-                    substituted_string = envsubst(file_template)
-                    with open(file_path, 'w', encoding='utf-8') as file:
-                        file.write(substituted_string)
-
-                except FileNotFoundError:
-                    print(f"Error: The file '{file_path}' was not found.")
-                except Exception as e:
-                    print(f"An error occurred: {e}")
-            else:
-                print(f"Removing file that is not in a _template dir: {file_path}")
-                os.remove(file_path)
+                if "_template" in str(file_path):
+                    try:
+                        print(f"Processing file: {file_path}")
+                        render_template_file(file_path)
+                        stats.files += 1
+                        stats.bytes += file_path.stat().st_size
+
+                    except FileNotFoundError:
+                        print(f"Error: The file '{file_path}' was not found.")
+                    except Exception as e:
+                        print(f"An error occurred: {e}")
+                else:
+                    print(f"Removing file that is not in a _template dir: {file_path}")
+                    os.remove(file_path)
 
     # Find all '_region' subdirectories and rename them
     region_dirs_found = 0
     region_dirs_renamed = 0
     print(f"\nSearching for '_region' subdirectories to rename to '{new_env_region}'...")
-    for root, dirs, files in os.walk(temp_path):
-        dir = Path(root)
-        if dir.name =='_region':
-            region_dirs_found += 1
-            new_dir = dir.parent / new_env_region
-            
-            try:
-                dir.rename(new_dir)
-                print(f"  Renamed: {dir.relative_to(temp_path)} -> {new_dir.relative_to(temp_path)}")
-                region_dirs_renamed += 1
-                
-                # Update dirs list to reflect the rename for os.walk
-                
-            except Exception as e:
-                print(f"  ERROR renaming {dir}: {e}")
+    with profile.phase("region rename") as stats:
+        for root, dirs, files in os.walk(temp_path):
+            dir = Path(root)
+            if dir.name =='_region':
+                region_dirs_found += 1
+                new_dir = dir.parent / new_env_region
+
+                try:
+                    dir.rename(new_dir)
+                    print(f"  Renamed: {dir.relative_to(temp_path)} -> {new_dir.relative_to(temp_path)}")
+                    region_dirs_renamed += 1
+
+                except Exception as e:
+                    print(f"  ERROR renaming {dir}: {e}")
+        stats.files = region_dirs_renamed
 
     # Find all '_template' subdirectories and rename them
     template_dirs_found = 0
     template_dirs_renamed = 0
+    template_dirs_merged = 0
+    template_errors = []
     print(f"\nSearching for '_template' subdirectories to rename to '{new_env_type}'...")
-    for root, dirs, files in os.walk(temp_path):
-        dir = Path(root)
-        if dir.name =='_template':
-            template_dirs_found += 1
-            new_dir = dir.parent / new_env_type
-            print(f" new_dir = {new_dir}")
-
-            try:
-                if new_dir.exists():
-                    print(f"  Merging contents of {dir} into existing directory {new_dir}")
-                    for item in dir.iterdir():
-                        move(str(item), str(new_dir))
-                    dir.rmdir()  # Remove the empty source directory
-                else:
-                    dir.rename(new_dir)
-                    print(f"  Renamed: {dir.relative_to(temp_path)} -> {new_dir.relative_to(temp_path)}")
+    with profile.phase("template rename") as stats:
+        for root, dirs, files in os.walk(temp_path):
+            dir = Path(root)
+            if dir.name =='_template':
+                template_dirs_found += 1
+                new_dir = dir.parent / new_env_type
+                print(f" new_dir = {new_dir}")
+
+                try:
+                    if new_dir.exists():
+                        # Only the directory skeleton of the environment is left here,
+                        # files are compared with the real environment when copying back
+                        print(f"  Merging contents of {dir} into existing directory {new_dir}")
+                        summary = merge_directory(dir, new_dir)
+                        template_dirs_merged += 1
+                        print(f"  Merged: {dir.relative_to(temp_path)} -> {new_dir.relative_to(temp_path)}")
+                        for error in summary.errors:
+                            print(f"  ERROR merging {error}")
+                            template_errors.append(f"{new_dir.relative_to(temp_path)}/{error}")
+                    else:
+                        dir.rename(new_dir)
+                        print(f"  Renamed: {dir.relative_to(temp_path)} -> {new_dir.relative_to(temp_path)}")
+
+                    template_dirs_renamed += 1
+
+                except Exception as e:
+                    print(f"  ERROR renaming {dir}: {e}")
+        stats.files = template_dirs_renamed
 
-                template_dirs_renamed += 1
-                
-            except Exception as e:
-                print(f"  ERROR renaming {dir}: {e}")
-    
     print(f"\nSummary:")
     print(f"  Found {template_dirs_found} '_template' subdirectories")
     print(f"  Successfully renamed {template_dirs_renamed} subdirectories")
+    if template_dirs_merged:
+        print(f"  Merged {template_dirs_merged} into existing directories")
+    if template_errors:
+        # Nothing was copied back yet, the environment is left as it was
+        with profile.phase("cleanup"):
+            shutil.rmtree(temp_path)
+        raise OSError(f"Could not merge {len(template_errors)} file(s) into existing environments: "
+                      f"{', '.join(template_errors)}")
 
-    # Copy the entire directory tree
+    # Merge the staged tree back, rewriting only the files that differ
     print(f"Copying {temp_path} to {path}...")
-    shutil.copytree(temp_path, path, dirs_exist_ok=True)
-    shutil.rmtree(temp_path)
+    with profile.phase("copy back") as stats:
+        summary = merge_directory(temp_path, path, move=False)
+        stats.files = summary.new + summary.changed
+        stats.bytes = summary.bytes
+    print(f"  Copied back: {summary}")
+    for error in summary.errors:
+        print(f"  ERROR copying {error}")
+    with profile.phase("cleanup"):
+        shutil.rmtree(temp_path)
+    if summary.errors:
+        raise OSError(f"Could not copy {len(summary.errors)} file(s) back to {path}")
     print(f"Copy complete.")
-    
+    return profile
+
+
 if __name__ == "__main__":
     import sys
     from dotenv import load_dotenv
@@ -127,20 +432,25 @@ if __name__ == "__main__":
         print("Error: .env file not found or could not be loaded.")
         sys.exit(1)
 
-    if len(sys.argv) != 2:
-        print("Usage: python copy_environment.py <source_dir>")
+    show_profile = '--profile' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--profile']
+
+    if len(args) != 1:
+        print("Usage: python copy_environment.py [--profile] <source_dir>")
         print("\nExample:")
         print("  python copy_environment.py ./platform")
+        print("  python copy_environment.py --profile ./platform")
         sys.exit(1)
 
-    
-    
-    source_dir = sys.argv[1]
+    source_dir = args[0]
     env_type = os.environ.get('environment_type')
     env_region = os.environ.get('aws_region')
 
     try:
-        copy_and_rename_environment(source_dir, env_type, env_region)
+        profile = copy_and_rename_environment(source_dir, env_type, env_region)
+        if show_profile:
+            print(f"\nProfile for {source_dir}:")
+            print(profile.report())
         sys.exit(0)
     except Exception as e:
         print(f"\nError: {e}")
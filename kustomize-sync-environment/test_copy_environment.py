@@ -0,0 +1,262 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from envsubst import envsubst
+
+from benchmark_copy_environment import Scenario, generate_overlay_tree
+from copy_environment import _safe_split_index, copy_and_rename_environment, merge_directory, render_template_file
+
+
+class TestSafeSplitIndex(unittest.TestCase):
+    def test_no_tokens(self):
+        self.assertEqual(_safe_split_index("plain text"), 10)
+
+    def test_complete_tokens(self):
+        buffer = "a: ${FOO}\nb: $BAR\n"
+        self.assertEqual(_safe_split_index(buffer), len(buffer))
+
+    def test_unterminated_bracketed_token(self):
+        self.assertEqual(_safe_split_index("image: ${IMAGE_T"), 7)
+
+    def test_unterminated_default_with_nested_simple_var(self):
+        self.assertEqual(_safe_split_index("x ${FOO:-a$BA"), 2)
+
+    def test_simple_var_at_end(self):
+        self.assertEqual(_safe_split_index("region: $AWS_REG"), 8)
+
+    def test_dollar_at_end(self):
+        self.assertEqual(_safe_split_index("cost 5$"), 6)
+
+    def test_escaped_dollar_kept_with_backslash(self):
+        self.assertEqual(_safe_split_index("a \\$FO"), 2)
+
+
+class TestRenderTemplateFile(unittest.TestCase):
+    ENV = {
+        'environment_type': 'sandbox',
+        'aws_region': 'eu-central-1',
+        'EMPTY': '',
+    }
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.dict(os.environ, self.ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _render(self, content: str, chunk_size: int) -> str:
+        path = Path(self.tmp.name) / "kustomization.yaml"
+        path.write_text(content, encoding='utf-8')
+        render_template_file(path, chunk_size=chunk_size)
+        return path.read_text(encoding='utf-8')
+
+    def test_matches_envsubst_for_every_chunk_size(self):
+        content = (
+            "env: ${environment_type}\n"
+            "region: $aws_region\n"
+            "empty: ${EMPTY:-fallback}\n"
+            "unset: ${MISSING-default-$aws_region}\n"
+            "escaped: \\$aws_region\n"
+            "price: 5$ and ${unterminated\n"
+        )
+        expected = envsubst(content)
+        for chunk_size in range(1, len(content) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self._render(content, chunk_size), expected)
+
+    def test_matches_envsubst_on_random_input(self):
+        rng = random.Random(42)
+        pieces = ["${environment_type}", "$aws_region", "${EMPTY:-x}", "\\$aws_region",
+                  "${MISSING-y}", "$", "{", "}", "\n", "text ", "é"]
+        for _ in range(50):
+            content = ''.join(rng.choice(pieces) for _ in range(200))
+            chunk_size = rng.randint(1, 64)
+            with self.subTest(content=content, chunk_size=chunk_size):
+                self.assertEqual(self._render(content, chunk_size), envsubst(content))
+
+    def test_no_temp_files_left_behind(self):
+        self._render("env: ${environment_type}\n", 4)
+        self.assertEqual([p.name for p in Path(self.tmp.name).iterdir()], ["kustomization.yaml"])
+
+    def test_preserves_file_mode(self):
+        path = Path(self.tmp.name) / "run.sh"
+        path.write_text("echo $aws_region\n", encoding='utf-8')
+        path.chmod(0o750)
+        render_template_file(path)
+        self.assertEqual(path.stat().st_mode & 0o777, 0o750)
+        self.assertEqual(path.read_text(encoding='utf-8'), "echo eu-central-1\n")
+
+    def test_source_untouched_on_error(self):
+        path = Path(self.tmp.name) / "kustomization.yaml"
+        path.write_text("env: ${environment_type}\n", encoding='utf-8')
+        with patch('copy_environment.envsubst', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                render_template_file(path)
+        self.assertEqual(path.read_text(encoding='utf-8'), "env: ${environment_type}\n")
+        self.assertEqual([p.name for p in Path(self.tmp.name).iterdir()], ["kustomization.yaml"])
+
+
+class TestMergeDirectory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = Path(self.tmp.name) / "_template"
+        self.destination = Path(self.tmp.name) / "sandbox"
+
+    def _write(self, root: Path, relative: str, content: str) -> None:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def test_classifies_new_identical_and_changed_files(self):
+        self._write(self.source, "new.yaml", "new")
+        self._write(self.source, "same.yaml", "same")
+        self._write(self.source, "app/changed.yaml", "after")
+        self._write(self.destination, "same.yaml", "same")
+        self._write(self.destination, "app/changed.yaml", "before")
+        self._write(self.destination, "app/kept.yaml", "kept")
+
+        summary = merge_directory(self.source, self.destination, workers=2)
+
+        self.assertEqual((summary.new, summary.identical, summary.changed), (1, 1, 1))
+        self.assertEqual(summary.errors, [])
+        self.assertEqual((self.destination / "new.yaml").read_text(), "new")
+        self.assertEqual((self.destination / "app" / "changed.yaml").read_text(), "after")
+        self.assertEqual((self.destination / "app" / "kept.yaml").read_text(), "kept")
+        self.assertFalse(self.source.exists())
+
+    def test_merges_into_existing_directory_skeleton(self):
+        self._write(self.source, "eu-central-1/a/kustomization.yaml", "a")
+        self._write(self.source, "eu-central-1/b/kustomization.yaml", "b")
+        (self.source / "empty").mkdir()
+        (self.destination / "eu-central-1" / "a").mkdir(parents=True)
+
+        summary = merge_directory(self.source, self.destination)
+
+        self.assertEqual(summary.new, 2)
+        self.assertEqual((self.destination / "eu-central-1" / "a" / "kustomization.yaml").read_text(), "a")
+        self.assertEqual((self.destination / "eu-central-1" / "b" / "kustomization.yaml").read_text(), "b")
+        self.assertTrue((self.destination / "empty").is_dir())
+
+    def test_reports_file_directory_conflicts(self):
+        self._write(self.source, "config/app.yaml", "app")
+        self._write(self.source, "patch.yaml", "patch")
+        self._write(self.destination, "config", "a file")
+        (self.destination / "patch.yaml").mkdir(parents=True)
+
+        summary = merge_directory(self.source, self.destination)
+
+        self.assertEqual(len(summary.errors), 2)
+        self.assertTrue(summary.errors[0].startswith("config:"))
+        self.assertTrue(summary.errors[1].startswith("patch.yaml:"))
+        self.assertEqual((self.destination / "config").read_text(), "a file")
+        # The source is kept so the entries that failed are not lost
+        self.assertEqual((self.source / "patch.yaml").read_text(), "patch")
+        self.assertEqual((self.source / "config" / "app.yaml").read_text(), "app")
+
+    def test_summary_is_deterministic(self):
+        for index in range(20):
+            self._write(self.source, f"dir-{index}/file.yaml", "x")
+            self._write(self.destination, f"dir-{index}", "conflict")
+
+        summary = merge_directory(self.source, self.destination, workers=8)
+
+        self.assertEqual([error.split(":")[0] for error in summary.errors],
+                         sorted(f"dir-{index}" for index in range(20)))
+
+
+class TestCopyAndRenameEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name) / f"platform-{os.getpid()}-{id(self)}"
+        patcher = patch.dict(os.environ, {'environment_type': 'sandbox', 'aws_region': 'eu-central-1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _sync(self):
+        with open(os.devnull, 'w') as devnull, patch('sys.stdout', devnull):
+            return copy_and_rename_environment(str(self.root), 'sandbox', 'eu-central-1')
+
+    def test_renders_and_renames_template_and_region_dirs(self):
+        generate_overlay_tree(self.root, Scenario("test", template_dirs=2, files_per_template=2,
+                                                  depth=2, region_dirs=1, template_size=64))
+        self._sync()
+
+        overlays = self.root / "service-0" / "level-0" / "level-1" / "overlays"
+        self.assertTrue((overlays / "_template" / "resource-0.yaml").exists())
+        rendered = (overlays / "sandbox" / "resource-0.yaml").read_text()
+        self.assertIn("sandbox-eu-central-1-default", rendered)
+        self.assertTrue((overlays / "sandbox" / "eu-central-1" / "resource-1.yaml").exists())
+
+    def test_merges_template_into_existing_environment(self):
+        generate_overlay_tree(self.root, Scenario("test", template_dirs=1, files_per_template=2,
+                                                  region_dirs=1, template_size=64))
+        overlays = self.root / "service-0" / "level-0" / "overlays"
+        (overlays / "sandbox" / "eu-central-1").mkdir(parents=True)
+        (overlays / "sandbox" / "eu-central-1" / "resource-1.yaml").write_text("stale")
+
+        self._sync()
+
+        self.assertIn("sandbox-eu-central-1", (overlays / "sandbox" / "eu-central-1" / "resource-1.yaml").read_text())
+        self.assertTrue((overlays / "sandbox" / "resource-0.yaml").exists())
+        self.assertFalse((overlays / "sandbox" / "eu-central-1" / "eu-central-1").exists())
+
+    def test_leaves_identical_environment_files_untouched(self):
+        generate_overlay_tree(self.root, Scenario("test", template_dirs=1, files_per_template=2, template_size=64))
+        overlays = self.root / "service-0" / "level-0" / "overlays"
+        self._sync()
+        identical = overlays / "sandbox" / "resource-0.yaml"
+        changed = overlays / "sandbox" / "resource-1.yaml"
+        old = time.time() - 3600
+        os.utime(identical, (old, old))
+        before = identical.stat()
+        changed.write_text("stale")
+        changed_inode = changed.stat().st_ino
+
+        profile = self._sync()
+
+        after = identical.stat()
+        self.assertEqual((after.st_ino, after.st_mtime), (before.st_ino, before.st_mtime))
+        self.assertIn("sandbox-eu-central-1", changed.read_text())
+        self.assertNotEqual(changed.stat().st_ino, changed_inode)
+        self.assertEqual(profile.phases["copy back"].files, 1)
+
+    def test_fails_when_template_cannot_be_merged(self):
+        generate_overlay_tree(self.root, Scenario("test", template_dirs=1, files_per_template=2, template_size=64))
+        overlays = self.root / "service-0" / "level-0" / "overlays"
+        (overlays / "sandbox" / "resource-0.yaml").mkdir(parents=True)
+
+        with self.assertRaisesRegex(OSError, "resource-0.yaml"):
+            self._sync()
+
+        self.assertTrue((overlays / "sandbox" / "resource-0.yaml").is_dir())
+        self.assertFalse((overlays / "sandbox" / "resource-1.yaml").exists())
+        self.assertFalse(Path(f"/tmp/{self.root.name}").exists())
+
+    def test_profile_records_every_phase(self):
+        generate_overlay_tree(self.root, Scenario("test", template_dirs=3, files_per_template=2,
+                                                  region_dirs=2, template_size=100))
+        profile = self._sync()
+
+        self.assertEqual(list(profile.phases), ["temp copy", "templating", "region rename",
+                                                "template rename", "copy back", "cleanup"])
+        # 3 services with one non-template kustomization.yaml and 2 templates each
+        self.assertEqual(profile.phases["temp copy"].files, 9)
+        self.assertEqual(profile.phases["templating"].files, 6)
+        self.assertEqual(profile.phases["region rename"].files, 2)
+        self.assertEqual(profile.phases["template rename"].files, 3)
+        self.assertEqual(profile.phases["copy back"].files, 6)
+        self.assertGreater(profile.phases["copy back"].bytes, 0)
+        self.assertIn("template rename", profile.report())
+        self.assertFalse(Path(f"/tmp/{self.root.name}").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark tag resolution of docker_image_utils.py against the get_tag loop.
+
+Generates metadata and custom tags for a platform build with the given number
+of modules, resolves the tag of every module once with a bash loop calling
+get_tag per module and once with load_matched_tags, checks both agree and
+prints the timings.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+LIB_DIR = Path(__file__).resolve().parent
+
+SHELL_LOOP = f'''
+source "{LIB_DIR}/docker-image-utils.sh"
+for module in $2; do
+  printf '%s\\t%s\\n' "$module" "$(get_tag "$1" "$module" "$3" "$4" 2>/dev/null)"
+done
+'''
+
+SHELL_INDEX = f'''
+source "{LIB_DIR}/docker-image-utils.sh"
+load_matched_tags "$1" "$2" "$3" "$4"
+for module in $2; do
+  printf '%s\\t%s\\n' "$module" "${{MATCHED_TAGS[$module]:-}}"
+done
+'''
+
+
+def generate_build(modules: int) -> Tuple[Dict, List[str], str]:
+    names = [f"service-{index}" for index in range(modules)]
+    metadata = {"modules": {name: {"ecr": {"repository": f"hawkai-{name}"},
+                                   "kustomize": {"path": f"platform/{name}"}} for name in names}}
+    custom_tags = ' '.join(f"hawk-platform-hawkai-{name}-1.{index}.0" for index, name in enumerate(names))
+    return metadata, names, custom_tags
+
+
+def run(script: str, metadata: Dict, modules: List[str], kustomize_overlays: str, custom_tags: str) -> Tuple[float, str]:
+    start = time.perf_counter()
+    result = subprocess.run(['bash', '-c', script, 'benchmark', json.dumps(metadata), ' '.join(modules),
+                             kustomize_overlays, custom_tags], capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark module tag resolution')
+    parser.add_argument('--modules', type=int, nargs='+', default=[10, 30, 60])
+    parser.add_argument('--kustomize-overlays', default='prod')
+    args = parser.parse_args(argv[1:])
+
+    print(f"{'Modules':>8}{'get_tag loop s':>16}{'index s':>10}{'speedup':>10}")
+    for count in args.modules:
+        metadata, modules, custom_tags = generate_build(count)
+        loop_seconds, loop_output = run(SHELL_LOOP, metadata, modules, args.kustomize_overlays, custom_tags)
+        index_seconds, index_output = run(SHELL_INDEX, metadata, modules, args.kustomize_overlays, custom_tags)
+        if loop_output != index_output:
+            sys.exit(f"Results differ for {count} modules:\n{loop_output}\n---\n{index_output}")
+        print(f"{count:>8}{loop_seconds:>16.3f}{index_seconds:>10.3f}{loop_seconds / index_seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
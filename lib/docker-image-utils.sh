@@ -1,6 +1,10 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+# Absolute directory of this file, resolved when sourced so later cd calls do
+# not break the path to docker_image_utils.py
+_DOCKER_IMAGE_UTILS_DIR=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+
 # Function to compare semantic versions
 compare_versions() {
   # Returns 0 if $1 >= $2, otherwise returns 1
@@ -26,3 +30,27 @@ get_tag() {
 
   echo "$matched_tag"
 }
+
+# Resolve the matched tag of all modules with a single call instead of one
+# get_tag call per module. The tags are stored in the MATCHED_TAGS associative
+# array, keyed by module, with the same matching rules as get_tag.
+load_matched_tags() {
+  local metadata="$1"
+  local modules="$2"
+  local kustomize_overlays="$3"
+  local custom_tags="$4"
+
+  # Captured first so a failing python3 fails the caller under set -e
+  local resolved
+  resolved=$(python3 "$_DOCKER_IMAGE_UTILS_DIR/docker_image_utils.py" \
+    --modules "$modules" \
+    --kustomize-overlays "$kustomize_overlays" \
+    --custom-tags "$custom_tags" \
+    --format tsv <<< "$metadata") || return $?
+
+  declare -gA MATCHED_TAGS=()
+  local module tag
+  while IFS=$'\t' read -r module tag; do
+    [[ -n "$module" ]] && MATCHED_TAGS["$module"]="$tag"
+  done <<< "$resolved"
+}
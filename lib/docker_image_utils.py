@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Resolve the custom tag of every module in one pass.
+
+Python counterpart of get_tag in docker-image-utils.sh. Instead of running jq
+and grep once per module, the metadata and the custom tags are parsed once
+into an index from ECR repository to the first tag matching it, with the same
+matching rules:
+
+- prod overlays: the repository followed by '-' and a digit, e.g. 'app-1.2.0'
+- other overlays: the repository delimited by '-' or the tag boundaries
+
+In both cases the repository has to start at the beginning of the tag or
+right after a '-'.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+
+def build_tag_index(custom_tags: List[str], prod: bool) -> Dict[str, str]:
+    """
+    Map every repository name a tag matches to the first tag matching it.
+
+    A tag can only match repositories made of whole '-'-separated segments of
+    the tag, so every run of consecutive segments is a candidate key.
+    """
+    index: Dict[str, str] = {}
+    for tag in custom_tags:
+        segments = tag.split('-')
+        for start in range(len(segments)):
+            for end in range(start, len(segments)):
+                if prod:
+                    following = segments[end + 1] if end + 1 < len(segments) else ''
+                    if not following[:1].isdigit():
+                        continue
+                index.setdefault('-'.join(segments[start:end + 1]), tag)
+    return index
+
+
+def resolve_tags(metadata: Dict, modules: List[str], kustomize_overlays: str, custom_tags: str) -> Dict[str, str]:
+    """
+    Return the matched tag of every module, an empty string when none matches.
+    """
+    index = build_tag_index(custom_tags.split(), prod=kustomize_overlays == 'prod')
+    resolved: Dict[str, str] = {}
+    for module in modules:
+        repository: Optional[str] = ((metadata.get('modules') or {}).get(module) or {}).get('ecr', {}).get('repository')
+        resolved[module] = index.get(repository, '') if repository else ''
+    return resolved
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Resolve the custom tag of every module')
+    parser.add_argument('--metadata', help='Build metadata JSON, read from stdin when omitted')
+    parser.add_argument('--modules', required=True, help='Module names separated by spaces')
+    parser.add_argument('--kustomize-overlays', required=True, help='The indicated overlays (dev, test, qa, prod)')
+    parser.add_argument('--custom-tags', default='', help='Custom tags separated by spaces')
+    parser.add_argument('--format', choices=['json', 'tsv'], default='json',
+                        help='JSON object, or one "module<TAB>tag" line per module for bash read loops')
+    args = parser.parse_args(argv[1:])
+
+    metadata = json.loads(args.metadata if args.metadata is not None else sys.stdin.read())
+    resolved = resolve_tags(metadata, args.modules.split(), args.kustomize_overlays, args.custom_tags)
+
+    if args.format == 'tsv':
+        for module, tag in resolved.items():
+            print(f"{module}\t{tag}")
+    else:
+        print(json.dumps(resolved))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
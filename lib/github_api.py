@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Shared GitHub REST API client for the composite actions.
+
+- Keep-alive connections are pooled and shared by the worker threads.
+- Responses are cached on disk. Entries younger than the TTL are served
+  without a request, older ones are revalidated with If-None-Match /
+  If-Modified-Since, so unchanged responses do not count against the rate
+  limit. Entries not used for longer than the maximum age are evicted.
+- All pages of a listing are fetched concurrently once the first page tells
+  how many there are.
+- Requests wait for the X-RateLimit-Reset time when the primary rate limit is
+  exhausted, and back off exponentially on secondary rate limits and server
+  errors.
+- Calls, cache hits and latencies are counted per endpoint.
+
+Actions import it with:
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+    from github_api import GitHubClient
+"""
+
+import argparse
+import base64
+import hashlib
+import http.client
+import json
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+
+# Number of page / detail requests in flight at the same time, also the size of the connection pool
+FETCH_WORKERS = 8
+
+PER_PAGE = 100
+
+REQUEST_TIMEOUT = 30
+
+# Cache entries not used for this long are evicted
+CACHE_MAX_AGE = 7 * 24 * 3600
+
+RETRIES = 4
+
+# Longest wait for a rate limit reset before giving up
+MAX_RATE_LIMIT_WAIT = 900
+
+_last_page_re = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+# Path segments replaced by ':id' in endpoint names: numbers and commit shas
+_id_segment_re = re.compile(r'^(\d+|[0-9a-f]{7,40})$')
+
+
+class GitHubApiError(Exception):
+    def __init__(self, status: int, url: str, body: str):
+        super().__init__(f"GitHub API {status} for {url}: {body[:200]}")
+        self.status = status
+        self.url = url
+        self.body = body
+
+
+@dataclass
+class CallStats:
+    calls: int = 0
+    requests: int = 0
+    cache_hits: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, seconds: float, requests: int, cache_hit: bool) -> None:
+        self.calls += 1
+        self.requests += requests
+        self.cache_hits += cache_hit
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+class ResponseCache:
+    """
+    JSON files of GET responses keyed by the sha256 of the URL.
+    """
+
+    def __init__(self, directory: Path, ttl: float = 0, max_age: float = CACHE_MAX_AGE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_age = max_age
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._file(url).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def store(self, url: str, entry: Dict[str, Any]) -> None:
+        entry = {**entry, 'stored_at': time.time()}
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_name, self._file(url))
+
+    def evict(self) -> int:
+        """Remove the entries not stored or revalidated within max_age, return how many."""
+        cutoff = time.time() - self.max_age
+        evicted = 0
+        for path in self.directory.glob('*.json'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    evicted += 1
+            except FileNotFoundError:
+                pass
+        return evicted
+
+
+class _ConnectionPool:
+    """
+    Idle keep-alive connections to one host, checked out by one thread at a time.
+    """
+
+    def __init__(self, api_url: str, timeout: float):
+        parts = urlsplit(api_url)
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self._netloc = parts.netloc
+        self._timeout = timeout
+        self._idle: 'queue.LifoQueue[http.client.HTTPConnection]' = queue.LifoQueue()
+
+    @contextmanager
+    def connection(self) -> Iterator[http.client.HTTPConnection]:
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connection_class(self._netloc, timeout=self._timeout)
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            raise
+        self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class GitHubClient:
+    """
+    GitHub REST client with pooled connections, a revalidated disk cache,
+    concurrent pagination and rate limit backoff.
+    """
+
+    def __init__(self, token: str, user: Optional[str] = None, api_url: str = GITHUB_API_URL,
+                 cache_dir: Optional[Path] = None, workers: int = FETCH_WORKERS, cache_ttl: float = 0,
+                 cache_max_age: float = CACHE_MAX_AGE, retries: int = RETRIES,
+                 max_rate_limit_wait: float = MAX_RATE_LIMIT_WAIT):
+        self.api_url = api_url.rstrip('/')
+        self._base_path = urlsplit(self.api_url).path
+        self.workers = workers
+        self.retries = retries
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.stats: Dict[str, CallStats] = {}
+        self.cache = ResponseCache(cache_dir, cache_ttl, cache_max_age) if cache_dir else None
+        if self.cache:
+            self.cache.evict()
+        self._pool = _ConnectionPool(self.api_url, REQUEST_TIMEOUT)
+        self._lock = threading.Lock()
+        self._rate_limit_reset = 0.0
+        self._headers = {
+            'Accept': 'application/vnd.github+json',
+            'User-Agent': 'hawk-ai-aml-github-actions',
+        }
+        if token and user:
+            credentials = base64.b64encode(f"{user}:{token}".encode()).decode()
+            self._headers['Authorization'] = f"Basic {credentials}"
+        elif token:
+            self._headers['Authorization'] = f"token {token}"
+
+    @property
+    def requests(self) -> int:
+        return sum(stats.requests for stats in self.stats.values())
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(stats.cache_hits for stats in self.stats.values())
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _request(self, url: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        with self._pool.connection() as connection:
+            try:
+                connection.request('GET', url, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection, retry once on a new one
+                connection.close()
+                connection.request('GET', url, headers=headers)
+                response = connection.getresponse()
+            body = response.read()
+            return response.status, {key.lower(): value for key, value in response.getheaders()}, body
+
+    def _wait_for_rate_limit(self) -> None:
+        with self._lock:
+            wait = self._rate_limit_reset - time.time()
+        if wait > 0:
+            if wait > self.max_rate_limit_wait:
+                raise GitHubApiError(403, self.api_url, f"rate limit exhausted for {wait:.0f}s")
+            print(f"GitHub API rate limit exhausted, waiting {wait:.0f}s")
+            time.sleep(wait)
+
+    def _backoff(self, status: int, headers: Dict[str, str], body: bytes, attempt: int) -> Optional[float]:
+        """
+        Return how long to wait before retrying a failed request, None when it
+        should not be retried.
+        """
+        if attempt >= self.retries:
+            return None
+        if status in (403, 429):
+            if headers.get('x-ratelimit-remaining') == '0' and 'x-ratelimit-reset' in headers:
+                reset = float(headers['x-ratelimit-reset']) + 1
+                with self._lock:
+                    self._rate_limit_reset = max(self._rate_limit_reset, reset)
+                return 0
+            if 'retry-after' in headers:
+                return float(headers['retry-after'])
+            if status == 429 or b'secondary rate limit' in body.lower():
+                return 2.0 ** attempt
+            return None
+        if status >= 500:
+            return 2.0 ** attempt
+        return None
+
+    def endpoint(self, path: str) -> str:
+        """Name of the endpoint of a path, ids and shas replaced by ':id'."""
+        segments = path.split('?')[0].strip('/').split('/')
+        return '/'.join(':id' if _id_segment_re.match(segment) else segment for segment in segments)
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, Dict[str, str]]:
+        """
+        Return the decoded JSON body and the headers of a GET request.
+        """
+        path = path.lstrip('/')
+        query = f"?{urlencode(params)}" if params else ''
+        url = f"{self._base_path}/{path}{query}"
+        cache_key = f"{self.api_url}/{path}{query}"
+
+        start = time.perf_counter()
+        requests = 0
+        cached = self.cache.load(cache_key) if self.cache else None
+        if cached and self.cache.is_fresh(cached):
+            self._record(path, start, requests, cache_hit=True)
+            return cached['body'], cached['headers']
+
+        headers = dict(self._headers)
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        elif cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit()
+            status, response_headers, body = self._request(url, headers)
+            requests += 1
+            if status < 400:
+                break
+            wait = self._backoff(status, response_headers, body, attempt)
+            if wait is None:
+                self._record(path, start, requests, cache_hit=False)
+                raise GitHubApiError(status, cache_key, body.decode('utf-8', errors='replace'))
+            time.sleep(wait)
+            attempt += 1
+
+        if response_headers.get('x-ratelimit-remaining') == '0' and 'x-ratelimit-reset' in response_headers:
+            with self._lock:
+                self._rate_limit_reset = max(self._rate_limit_reset, float(response_headers['x-ratelimit-reset']) + 1)
+
+        if status == 304 and cached:
+            self.cache.store(cache_key, cached)
+            self._record(path, start, requests, cache_hit=True)
+            return cached['body'], cached['headers']
+
+        decoded = json.loads(body.decode('utf-8')) if body else None
+        if self.cache and (self.cache.ttl or response_headers.get('etag') or response_headers.get('last-modified')):
+            self.cache.store(cache_key, {
+                'etag': response_headers.get('etag'),
+                'last_modified': response_headers.get('last-modified'),
+                'headers': response_headers,
+                'body': decoded,
+            })
+        self._record(path, start, requests, cache_hit=False)
+        return decoded, response_headers
+
+    def _record(self, path: str, start: float, requests: int, cache_hit: bool) -> None:
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.stats.setdefault(self.endpoint(path), CallStats()).record(seconds, requests, cache_hit)
+
+    def get_pages(self, path: str, params: Optional[Dict[str, Any]] = None,
+                  total: Optional[Callable[[Any], int]] = None) -> List[Any]:
+        """
+        Return the bodies of all pages, in page order. The number of pages is
+        read from the 'last' link of the first page, or from the item count
+        total(first_body) for endpoints that report one. The remaining pages
+        are fetched concurrently.
+        """
+        params = {'per_page': PER_PAGE, **(params or {})}
+        first, headers = self.get(path, {**params, 'page': 1})
+        match = _last_page_re.search(headers.get('link', ''))
+        last_page = int(match.group(1)) if match else 1
+        if total:
+            last_page = max(last_page, -(-total(first) // params['per_page']))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            rest = executor.map(lambda page: self.get(path, {**params, 'page': page})[0], range(2, last_page + 1))
+            return [first, *rest]
+
+    def paginate(self, path: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Return the items of all pages of a listing."""
+        return [item for page in self.get_pages(path, params) for item in page]
+
+    def report(self) -> str:
+        lines = [f"{'Endpoint':<48}{'calls':>7}{'requests':>10}{'cached':>8}{'total s':>9}{'max s':>8}"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{name:<48}{stats.calls:>7}{stats.requests:>10}{stats.cache_hits:>8}"
+                         f"{stats.seconds:>9.3f}{stats.max_seconds:>8.3f}")
+        return '\n'.join(lines)
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='GET a GitHub API path through the shared cache')
+    parser.add_argument('path', help='API path, e.g. users/octocat')
+    parser.add_argument('--field', help='Print this top level field of the response instead of the whole body')
+    parser.add_argument('--cache-dir', type=Path, help='Directory for the response cache')
+    parser.add_argument('--cache-ttl', type=float, default=0, help='Seconds a cached response is used unchecked')
+    parser.add_argument('--api-url', default=GITHUB_API_URL)
+    args = parser.parse_args(argv[1:])
+
+    client = GitHubClient(
+        token=os.environ.get('GITHUB_API_TOKEN', ''),
+        user=os.environ.get('GITHUB_API_USER'),
+        api_url=args.api_url,
+        cache_dir=args.cache_dir,
+        cache_ttl=args.cache_ttl,
+    )
+    body, _ = client.get(args.path)
+    if args.field:
+        value = body.get(args.field) if isinstance(body, dict) else None
+        print(value if isinstance(value, str) else json.dumps(value))
+    else:
+        print(json.dumps(body))
+    print(client.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
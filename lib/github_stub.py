@@ -0,0 +1,79 @@
+"""
+Stub GitHub API server for the tests of the actions that use github_api.py.
+
+Test modules subclass GitHubStubHandler with their own fixtures and start it
+with start_server. Responses carry an ETag, or the Last-Modified header a
+fixture sets, and conditional requests that match are answered with 304 Not
+Modified like the real API does.
+"""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+Response = Tuple[int, Any, Dict[str, str]]
+
+NOT_FOUND: Response = (404, {"message": "Not Found"}, {})
+
+
+class GitHubStubHandler(BaseHTTPRequestHandler):
+    """
+    Records every GET request in server.requests and answers it with the
+    response returned by route.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self.server.lock:
+            self.server.requests.append(self.path)
+            self.server.connections.add(self.client_address)
+        self.send_json(*self.route(url.path, query))
+
+    def route(self, path: str, query: Dict[str, str]) -> Response:
+        return NOT_FOUND
+
+    def page(self, path: str, query: Dict[str, str], items: List[Any]) -> Response:
+        """Return a page of items with a rel="last" Link header on all but the last page."""
+        per_page, page = int(query.get('per_page', 30)), int(query.get('page', 1))
+        last = -(-len(items) // per_page)
+        body = items[(page - 1) * per_page:page * per_page]
+        headers = {'Link': f'<http://stub{path}?per_page={per_page}&page={last}>; rel="last"'} if page < last else {}
+        return 200, body, headers
+
+    def send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        headers = dict(headers or {})
+        if status == 200 and 'Last-Modified' not in headers:
+            headers['ETag'] = f'"{hash(json.dumps(body))}"'
+        if status == 200 and ((self.headers.get('If-None-Match') or 0) == headers.get('ETag') or
+                              (self.headers.get('If-Modified-Since') or 0) == headers.get('Last-Modified')):
+            status, body = 304, None
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(test: unittest.TestCase, handler=GitHubStubHandler) -> ThreadingHTTPServer:
+    """Serve handler on a free local port until the end of the test, its URL is server.url."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.connections = set()
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return server
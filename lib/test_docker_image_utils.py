@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from docker_image_utils import build_tag_index, resolve_tags
+
+LIB_DIR = Path(__file__).resolve().parent
+
+METADATA = {
+    "modules": {
+        "payments": {"ecr": {"repository": "payments"}},
+        "case-manager": {"ecr": {"repository": "case-manager"}},
+        "manager": {"ecr": {"repository": "manager"}},
+        "frontend": {"ecr": {"repository": "case-manager-frontend"}},
+        "docs": {"kustomize": {"path": "docs"}},
+    }
+}
+MODULES = ["payments", "case-manager", "manager", "frontend", "docs", "unknown"]
+CUSTOM_TAGS = "hawk-case-manager-frontend-4.2.1 hawk-case-manager-4.2.1 payments-1.0.0 hawk-manager-rc-4.2.1"
+
+
+def shell_get_tag(module: str, kustomize_overlays: str) -> str:
+    script = f'source "{LIB_DIR}/docker-image-utils.sh"; get_tag "$1" "$2" "$3" "$4"'
+    result = subprocess.run(['bash', '-c', script, 'get_tag', json.dumps(METADATA), module, kustomize_overlays,
+                             CUSTOM_TAGS], capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+class TestBuildTagIndex(unittest.TestCase):
+    def test_non_prod_matches_whole_segments(self):
+        index = build_tag_index(["hawk-case-manager-rc"], prod=False)
+        self.assertEqual(index["case-manager"], "hawk-case-manager-rc")
+        self.assertEqual(index["manager-rc"], "hawk-case-manager-rc")
+        self.assertNotIn("ase-manager", index)
+
+    def test_prod_requires_version_after_repository(self):
+        index = build_tag_index(["hawk-case-manager-4.2.1"], prod=True)
+        self.assertEqual(index["case-manager"], "hawk-case-manager-4.2.1")
+        self.assertNotIn("hawk-case", index)
+        self.assertNotIn("4.2.1", index)
+
+    def test_first_tag_wins(self):
+        index = build_tag_index(["app-1.0.0", "app-2.0.0"], prod=True)
+        self.assertEqual(index["app"], "app-1.0.0")
+
+
+class TestResolveTags(unittest.TestCase):
+    def test_prod(self):
+        self.assertEqual(resolve_tags(METADATA, MODULES, "prod", CUSTOM_TAGS), {
+            "payments": "payments-1.0.0",
+            "case-manager": "hawk-case-manager-4.2.1",
+            "manager": "hawk-case-manager-4.2.1",
+            "frontend": "hawk-case-manager-frontend-4.2.1",
+            "docs": "",
+            "unknown": "",
+        })
+
+    def test_non_prod(self):
+        resolved = resolve_tags(METADATA, MODULES, "dev", CUSTOM_TAGS)
+        self.assertEqual(resolved["case-manager"], "hawk-case-manager-frontend-4.2.1")
+        self.assertEqual(resolved["manager"], "hawk-case-manager-frontend-4.2.1")
+
+    @unittest.skipUnless(shutil.which('bash') and shutil.which('jq'), 'bash and jq are required')
+    def test_matches_shell_get_tag(self):
+        for overlays in ("prod", "dev"):
+            resolved = resolve_tags(METADATA, MODULES[:4], overlays, CUSTOM_TAGS)
+            for module in MODULES[:4]:
+                with self.subTest(overlays=overlays, module=module):
+                    self.assertEqual(resolved[module], shell_get_tag(module, overlays))
+
+
+@unittest.skipUnless(shutil.which('bash'), 'bash is required')
+class TestLoadMatchedTags(unittest.TestCase):
+    def _run(self, script: str) -> subprocess.CompletedProcess:
+        # Sourced through a relative path, then called from another directory like kustomize-base-overlay does
+        with tempfile.TemporaryDirectory() as tmp:
+            os.mkdir(Path(tmp) / "kustomize-base")
+            os.symlink(LIB_DIR, Path(tmp) / "lib")
+            return subprocess.run(['bash', '-c', script, 'load_matched_tags', json.dumps(METADATA), ' '.join(MODULES),
+                                   'prod', CUSTOM_TAGS], cwd=tmp, capture_output=True, text=True)
+
+    def test_loads_tags_after_changing_directory(self):
+        result = self._run('''
+            source ./lib/docker-image-utils.sh
+            cd kustomize-base
+            load_matched_tags "$1" "$2" "$3" "$4"
+            for module in $2; do printf '%s=%s\\n' "$module" "${MATCHED_TAGS[$module]:-}"; done
+            ''')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("case-manager=hawk-case-manager-4.2.1\n", result.stdout)
+        self.assertIn("payments=payments-1.0.0\n", result.stdout)
+
+    def test_fails_when_resolution_fails(self):
+        result = self._run('''
+            source ./lib/docker-image-utils.sh
+            _DOCKER_IMAGE_UTILS_DIR=/nonexistent
+            load_matched_tags "$1" "$2" "$3" "$4"
+            echo unreachable
+            ''')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertNotIn("unreachable", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
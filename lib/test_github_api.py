@@ -0,0 +1,119 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from github_api import GitHubApiError, GitHubClient
+from github_stub import NOT_FOUND, GitHubStubHandler, start_server
+
+ITEMS = [{"id": index} for index in range(250)]
+
+
+class FixtureHandler(GitHubStubHandler):
+    def route(self, path, query):
+        with self.server.lock:
+            failures = self.server.failures.pop(path, [])
+            if failures[1:]:
+                self.server.failures[path] = failures[1:]
+        if failures:
+            status, headers = failures[0]
+            return status, {"message": "failure"}, headers
+
+        if path == "/items":
+            return self.page(path, query, ITEMS)
+        if path == "/users/octocat":
+            return 200, {"login": "octocat", "blog": "U123"}, {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        if path.startswith("/repos/org/repo/commits/"):
+            return 200, {"sha": path.rsplit("/", 1)[1]}, {}
+        return NOT_FOUND
+
+
+class TestGitHubClient(unittest.TestCase):
+    def setUp(self):
+        self.server = start_server(self, FixtureHandler)
+        self.server.failures = {}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = Path(self.tmp.name) / "cache"
+
+    def client(self, **kwargs) -> GitHubClient:
+        client = GitHubClient(token="token", api_url=self.server.url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_paginates_concurrently_in_order(self):
+        client = self.client(workers=4)
+        self.assertEqual(client.paginate("items"), ITEMS)
+        self.assertEqual(client.requests, 3)
+
+    def test_reuses_connections(self):
+        client = self.client(workers=1)
+        for index in range(5):
+            client.get(f"repos/org/repo/commits/{index:07x}")
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_revalidates_with_etag_and_last_modified(self):
+        self.client(cache_dir=self.cache_dir).paginate("items")
+        self.client(cache_dir=self.cache_dir).get("users/octocat")
+
+        client = self.client(cache_dir=self.cache_dir)
+        self.assertEqual(client.paginate("items"), ITEMS)
+        self.assertEqual(client.get("users/octocat")[0]["blog"], "U123")
+        self.assertEqual((client.requests, client.cache_hits), (4, 4))
+
+    def test_fresh_entries_skip_the_request(self):
+        self.client(cache_dir=self.cache_dir, cache_ttl=60).get("users/octocat")
+        client = self.client(cache_dir=self.cache_dir, cache_ttl=60)
+        self.assertEqual(client.get("users/octocat")[0]["login"], "octocat")
+        self.assertEqual((client.requests, client.cache_hits), (0, 1))
+
+    def test_evicts_old_entries(self):
+        self.client(cache_dir=self.cache_dir).get("users/octocat")
+        entry = next(self.cache_dir.glob("*.json"))
+        old = time.time() - 3600
+        os.utime(entry, (old, old))
+
+        self.client(cache_dir=self.cache_dir, cache_max_age=60)
+        self.assertFalse(entry.exists())
+
+    def test_waits_for_rate_limit_reset(self):
+        reset = str(int(time.time()) + 30)
+        self.server.failures["/users/octocat"] = [
+            (403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}),
+        ]
+        client = self.client()
+        with mock.patch("github_api.time.sleep") as sleep:
+            self.assertEqual(client.get("users/octocat")[0]["login"], "octocat")
+        waits = [call.args[0] for call in sleep.call_args_list if call.args[0] > 0]
+        self.assertEqual(len(waits), 1)
+        self.assertGreater(waits[0], 25)
+        self.assertEqual(client.requests, 2)
+
+    def test_backs_off_on_secondary_rate_limit_and_server_errors(self):
+        self.server.failures["/users/octocat"] = [(429, {}), (502, {}), (403, {"Retry-After": "7"})]
+        client = self.client()
+        with mock.patch("github_api.time.sleep") as sleep:
+            client.get("users/octocat")
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1.0, 2.0, 7.0])
+
+    def test_raises_client_errors(self):
+        client = self.client()
+        with self.assertRaises(GitHubApiError) as raised:
+            client.get("users/missing")
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(client.requests, 1)
+
+    def test_counts_calls_per_endpoint(self):
+        client = self.client()
+        for sha in ("abc1234", "def5678"):
+            client.get(f"repos/org/repo/commits/{sha}")
+        stats = client.stats["repos/org/repo/commits/:id"]
+        self.assertEqual((stats.calls, stats.requests), (2, 2))
+        self.assertGreater(stats.seconds, 0)
+        self.assertIn("repos/org/repo/commits/:id", client.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Detect the modules of a repository that have code changes.
+
+Commit details are fetched from the GitHub API concurrently through the shared
+client in lib/github_api.py, see its docstring for the response cache. When the
+commits are available in the local checkout the changed files are read with
+git instead. Changed files are matched to modules with a prefix trie of the
+module roots.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+from github_api import FETCH_WORKERS, GITHUB_API_URL, GitHubClient  # noqa: E402
+
+# GitHub file status for every git --name-status letter
+GIT_STATUSES = {
+    'A': 'added',
+    'C': 'copied',
+    'D': 'removed',
+    'M': 'modified',
+    'R': 'renamed',
+    'T': 'changed',
+}
+
+
+@dataclass
+class ChangedFile:
+    filename: str
+    status: str
+
+
+@dataclass
+class ModuleTrie:
+    """
+    Prefix trie of module root paths, split into path segments.
+    """
+    root: Dict[str, Any] = field(default_factory=dict)
+
+    _MODULE = '\0module'
+
+    @classmethod
+    def build(cls, modules: Iterable[str]) -> 'ModuleTrie':
+        trie = cls()
+        for module in modules:
+            node = trie.root
+            for segment in module.strip('/').split('/'):
+                node = node.setdefault(segment, {})
+            node[cls._MODULE] = module
+        return trie
+
+    def match(self, filename: str) -> Optional[str]:
+        """Return the module with the longest root that contains the file."""
+        node = self.root
+        found = None
+        for segment in filename.split('/'):
+            node = node.get(segment)
+            if node is None:
+                break
+            found = node.get(self._MODULE, found)
+        return found
+
+
+def _run_git(repo_dir: Path, *args: str) -> Optional[str]:
+    result = subprocess.run(['git', '-C', str(repo_dir), *args], capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+
+def _has_commit(repo_dir: Path, sha: str) -> bool:
+    return _run_git(repo_dir, 'cat-file', '-e', f"{sha}^{{commit}}") is not None
+
+
+def _parse_name_status(output: str) -> List[ChangedFile]:
+    files: List[ChangedFile] = []
+    fields = output.split('\0')
+    index = 0
+    while index < len(fields) and fields[index]:
+        letter = fields[index][0]
+        # Renames and copies list the old and the new path, GitHub reports the new one
+        paths = 2 if letter in 'RC' else 1
+        filename = fields[index + paths]
+        files.append(ChangedFile(filename, GIT_STATUSES.get(letter, 'changed')))
+        index += paths + 1
+    return files
+
+
+def commit_files_from_git(repo_dir: Path, sha: str) -> Optional[List[ChangedFile]]:
+    """
+    Return the files changed by a commit relative to its first parent, or None
+    if the commit or its parent is not available in the local checkout.
+    """
+    if not _has_commit(repo_dir, sha):
+        return None
+    # Read the parents from the commit object itself, a shallow checkout hides them otherwise
+    commit = _run_git(repo_dir, 'cat-file', 'commit', sha) or ''
+    parents = [line.split()[1] for line in commit.split('\n\n', 1)[0].splitlines() if line.startswith('parent ')]
+    if not parents:
+        output = _run_git(repo_dir, 'diff-tree', '-z', '--root', '-r', '--no-commit-id', '--name-status', '-M', sha)
+    elif _has_commit(repo_dir, parents[0]):
+        output = _run_git(repo_dir, 'diff', '-z', '--name-status', '-M', parents[0], sha)
+    else:
+        return None
+    return None if output is None else _parse_name_status(output)
+
+
+def diff_files_from_git(repo_dir: Path, base: str, head: str) -> Optional[List[ChangedFile]]:
+    """
+    Return the files changed between the merge base of base and head, or None
+    if either commit is not available in the local checkout.
+    """
+    if not (_has_commit(repo_dir, base) and _has_commit(repo_dir, head)):
+        return None
+    output = _run_git(repo_dir, 'diff', '-z', '--name-status', '-M', f"{base}...{head}")
+    return None if output is None else _parse_name_status(output)
+
+
+def commit_files_from_api(client: GitHubClient, repository: str, sha: str) -> List[ChangedFile]:
+    commit, _ = client.get(f"repos/{repository}/commits/{sha}")
+    return [ChangedFile(f['filename'], f['status']) for f in commit.get('files', [])]
+
+
+def unsigned_commits(client: GitHubClient, repository: str, branch: str) -> List[str]:
+    """
+    Return the latest commits of the branch up to the first signed one, which
+    is the last commit that went through a merge on GitHub.
+    """
+    commits, _ = client.get(f"repos/{repository}/commits", {'sha': branch})
+    shas: List[str] = []
+    for commit in commits:
+        if commit['commit'].get('verification', {}).get('signature') is not None:
+            break
+        shas.append(commit['sha'])
+    return shas
+
+
+def changed_files_for_commits(client: GitHubClient, repository: str, shas: List[str],
+                              repo_dir: Optional[Path] = None) -> List[List[ChangedFile]]:
+    """
+    Return the changed files of every commit, in the order of the commits.
+    """
+    def files(sha: str) -> List[ChangedFile]:
+        local = commit_files_from_git(repo_dir, sha) if repo_dir else None
+        return local if local is not None else commit_files_from_api(client, repository, sha)
+
+    with ThreadPoolExecutor(max_workers=client.workers) as executor:
+        return list(executor.map(files, shas))
+
+
+def pull_request_files(client: GitHubClient, repository: str, event: Dict[str, Any],
+                       repo_dir: Optional[Path] = None) -> List[ChangedFile]:
+    pull_request = event['pull_request']
+    if repo_dir:
+        local = diff_files_from_git(repo_dir, pull_request['base']['sha'], pull_request['head']['sha'])
+        if local is not None:
+            return local
+    files = client.paginate(f"repos/{repository}/pulls/{pull_request['number']}/files")
+    return [ChangedFile(f['filename'], f['status']) for f in files]
+
+
+def match_modules(trie: ModuleTrie, modules: List[str], files: Iterable[ChangedFile]) -> List[str]:
+    """Return the modules containing any of the files, in the order of modules."""
+    matched = {trie.match(f.filename) for f in files}
+    return [module for module in modules if module in matched]
+
+
+def resolve_modules(modules: List[str], matched: List[str], files: List[ChangedFile]) -> List[str]:
+    """
+    Fall back to all modules when files changed outside of every module, or
+    only the core module changed, since those changes affect every module.
+    """
+    if matched in ([], ['core']) and files:
+        return matched + [module for module in modules if module not in matched]
+    return matched
+
+
+def detect_changes(workflow_type: str, modules: List[str], client: GitHubClient, repository: str,
+                   branch: str = '', event: Optional[Dict[str, Any]] = None,
+                   repo_dir: Optional[Path] = None) -> Tuple[List[str], List[ChangedFile]]:
+    """
+    Return the updated modules and the changed files for the workflow type.
+    """
+    trie = ModuleTrie.build(modules)
+
+    if workflow_type == 'manual':
+        shas = unsigned_commits(client, repository, branch)
+        print(f"IDS: {' '.join(shas)}")
+        files: List[ChangedFile] = []
+        matched: List[str] = []
+        for commit_files in changed_files_for_commits(client, repository, shas, repo_dir):
+            modified = [f for f in commit_files if f.status == 'modified']
+            files.extend(modified)
+            matched.extend(m for m in match_modules(trie, modules, modified) if m not in matched)
+    elif workflow_type == 'pr':
+        files = pull_request_files(client, repository, event or {}, repo_dir)
+        print(f"FILES: {len(files)}")
+        matched = match_modules(trie, modules, files)
+    else:
+        return list(modules), []
+
+    return resolve_modules(modules, matched, files), files
+
+
+def format_outputs(modules: List[str]) -> Dict[str, str]:
+    return {
+        'updatedModules': json.dumps(modules, separators=(',', ':')),
+        'updatedModulesString': ''.join(f"{module} " for module in modules),
+    }
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Detect the modules of a repository that have code changes')
+    parser.add_argument('--repository', required=True, help='Repository in owner/name form')
+    parser.add_argument('--modules', required=True, help='Module names separated by spaces')
+    parser.add_argument('--workflow-type', default=os.environ.get('WORKFLOW_TYPE', ''),
+                        help='"manual" scans unsigned branch commits, "pr" the pull request files, '
+                             'anything else selects all modules')
+    parser.add_argument('--branch', default='', help='Branch to scan in manual workflows')
+    parser.add_argument('--event-path', default=os.environ.get('GITHUB_EVENT_PATH'),
+                        help='GitHub event payload, used in pr workflows')
+    parser.add_argument('--repo-dir', type=Path,
+                        help='Local checkout to read changed files from when it has the commits')
+    parser.add_argument('--cache-dir', type=Path, help='Directory for the GitHub API response cache')
+    parser.add_argument('--api-url', default=GITHUB_API_URL)
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS)
+    args = parser.parse_args(argv[1:])
+
+    client = GitHubClient(
+        token=os.environ.get('REPOSITORY_ACCESS_TOKEN', ''),
+        user=os.environ.get('REPOSITORY_USER'),
+        api_url=args.api_url,
+        cache_dir=args.cache_dir,
+        workers=args.workers,
+    )
+
+    event = None
+    if args.workflow_type == 'pr':
+        event = json.loads(Path(args.event_path).read_text())
+        print(f"PR: {event['pull_request']['number']}")
+    elif args.workflow_type == 'manual':
+        print(f"Branch: {args.branch}")
+
+    modules, files = detect_changes(args.workflow_type, args.modules.split(), client, args.repository,
+                                    args.branch, event, args.repo_dir)
+    print(f"API requests: {client.requests} ({client.cache_hits} served from cache)")
+    print(client.report())
+
+    outputs = format_outputs(modules)
+    lines = ''.join(f"{key}={value}\n" for key, value in outputs.items())
+    print(lines, end='')
+    for env_file in ('GITHUB_STEP_SUMMARY', 'GITHUB_OUTPUT'):
+        if os.environ.get(env_file):
+            with open(os.environ[env_file], 'a') as f:
+                f.write(lines)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,198 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from detect_changes import (ChangedFile, GitHubClient, ModuleTrie, commit_files_from_git, detect_changes,
+                            format_outputs, resolve_modules)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+from github_stub import NOT_FOUND, GitHubStubHandler, start_server  # noqa: E402
+
+REPOSITORY = "hawk-ai-aml/monorepo"
+
+SIGNATURE = {"verified": True, "reason": "valid", "signature": "-----BEGIN PGP SIGNATURE-----"}
+UNSIGNED = {"verified": False, "reason": "unsigned", "signature": None}
+
+# Trimmed responses recorded from the GitHub REST API
+FIXTURES = {
+    f"/repos/{REPOSITORY}/commits?sha=feature": [
+        {"sha": "c3", "commit": {"verification": UNSIGNED}},
+        {"sha": "c2", "commit": {"verification": UNSIGNED}},
+        {"sha": "c1", "commit": {"verification": SIGNATURE}},
+        {"sha": "c0", "commit": {"verification": UNSIGNED}},
+    ],
+    f"/repos/{REPOSITORY}/commits/c3": {"sha": "c3", "files": [
+        {"filename": "payments/src/app.py", "status": "modified"},
+        {"filename": "billing/new.py", "status": "added"},
+    ]},
+    f"/repos/{REPOSITORY}/commits/c2": {"sha": "c2", "files": [
+        {"filename": "accounts/README.md", "status": "modified"},
+        {"filename": "payments/setup.py", "status": "modified"},
+    ]},
+    f"/repos/{REPOSITORY}/commits/c0": {"sha": "c0", "files": [
+        {"filename": "billing/app.py", "status": "modified"},
+    ]},
+    f"/repos/{REPOSITORY}/pulls/7/files?per_page=100&page=1": [
+        {"filename": "core/lib.py", "status": "modified"},
+    ],
+    f"/repos/{REPOSITORY}/pulls/7/files?per_page=100&page=2": [
+        {"filename": "billing/app.py", "status": "removed"},
+    ],
+    f"/repos/{REPOSITORY}/pulls/8/files?per_page=100&page=1": [
+        {"filename": "README.md", "status": "modified"},
+    ],
+}
+
+LINKS = {
+    f"/repos/{REPOSITORY}/pulls/7/files?per_page=100&page=1":
+        f'<http://stub/repos/{REPOSITORY}/pulls/7/files?per_page=100&page=2>; rel="next", '
+        f'<http://stub/repos/{REPOSITORY}/pulls/7/files?per_page=100&page=2>; rel="last"',
+}
+
+
+class FixtureHandler(GitHubStubHandler):
+    def route(self, path, query):
+        if self.path not in FIXTURES:
+            return NOT_FOUND
+        return 200, FIXTURES[self.path], {"Link": LINKS[self.path]} if self.path in LINKS else {}
+
+
+class FixtureServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = start_server(self, FixtureHandler)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def client(self, cache: bool = False) -> GitHubClient:
+        cache_dir = Path(self.tmp.name) / "cache" if cache else None
+        return GitHubClient(token="token", api_url=self.server.url, cache_dir=cache_dir)
+
+
+class TestModuleTrie(unittest.TestCase):
+    def test_matches_first_segment(self):
+        trie = ModuleTrie.build(["payments", "billing"])
+        self.assertEqual(trie.match("payments/src/app.py"), "payments")
+        self.assertIsNone(trie.match("payments-v2/app.py"))
+        self.assertIsNone(trie.match("README.md"))
+
+    def test_matches_longest_nested_root(self):
+        trie = ModuleTrie.build(["services", "services/payments"])
+        self.assertEqual(trie.match("services/payments/app.py"), "services/payments")
+        self.assertEqual(trie.match("services/billing/app.py"), "services")
+
+
+class TestResolveModules(unittest.TestCase):
+    MODULES = ["core", "payments", "billing"]
+
+    def test_keeps_matched_modules(self):
+        files = [ChangedFile("payments/app.py", "modified")]
+        self.assertEqual(resolve_modules(self.MODULES, ["payments"], files), ["payments"])
+
+    def test_core_only_selects_all_modules(self):
+        files = [ChangedFile("core/lib.py", "modified")]
+        self.assertEqual(resolve_modules(self.MODULES, ["core"], files), ["core", "payments", "billing"])
+
+    def test_files_outside_modules_select_all_modules(self):
+        files = [ChangedFile("README.md", "modified")]
+        self.assertEqual(resolve_modules(self.MODULES, [], files), self.MODULES)
+
+    def test_no_files_selects_nothing(self):
+        self.assertEqual(resolve_modules(self.MODULES, [], []), [])
+
+    def test_format_outputs(self):
+        self.assertEqual(format_outputs(["payments", "billing"]), {
+            'updatedModules': '["payments","billing"]',
+            'updatedModulesString': 'payments billing ',
+        })
+
+
+class TestDetectChangesApi(FixtureServerTestCase):
+    MODULES = ["accounts", "billing", "payments"]
+
+    def test_manual_scans_unsigned_commits_only(self):
+        modules, files = detect_changes("manual", self.MODULES, self.client(), REPOSITORY, branch="feature")
+
+        # c3 changes payments (billing/new.py is added, not modified), c2 accounts and payments
+        self.assertEqual(modules, ["payments", "accounts"])
+        self.assertEqual([f.filename for f in files], ["payments/src/app.py", "accounts/README.md",
+                                                       "payments/setup.py"])
+        self.assertNotIn(f"/repos/{REPOSITORY}/commits/c0", self.server.requests)
+
+    def test_pr_fetches_all_pages(self):
+        modules, files = detect_changes("pr", ["core"] + self.MODULES, self.client(), REPOSITORY,
+                                        event={"pull_request": {"number": 7, "base": {"sha": "b"},
+                                                                "head": {"sha": "h"}}})
+
+        self.assertEqual(modules, ["core", "billing"])
+        self.assertEqual(len(files), 2)
+
+    def test_pr_without_module_changes_selects_all_modules(self):
+        modules, _ = detect_changes("pr", self.MODULES, self.client(), REPOSITORY,
+                                    event={"pull_request": {"number": 8}})
+        self.assertEqual(modules, self.MODULES)
+
+    def test_other_workflows_select_all_modules(self):
+        modules, files = detect_changes("release", self.MODULES, self.client(), REPOSITORY)
+        self.assertEqual((modules, files), (self.MODULES, []))
+        self.assertEqual(self.server.requests, [])
+
+    def test_etag_cache_revalidates(self):
+        first = self.client(cache=True)
+        detect_changes("manual", self.MODULES, first, REPOSITORY, branch="feature")
+        second = self.client(cache=True)
+        modules, _ = detect_changes("manual", self.MODULES, second, REPOSITORY, branch="feature")
+
+        self.assertEqual(modules, ["payments", "accounts"])
+        self.assertEqual(first.cache_hits, 0)
+        self.assertEqual(second.cache_hits, second.requests)
+
+
+class TestLocalGitHistory(FixtureServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo = Path(self.tmp.name) / "repo"
+        self.repo.mkdir()
+        self._git("init", "-q")
+        self._commit({"payments/app.py": "v1", "billing/app.py": "v1"})
+
+    def _git(self, *args: str) -> str:
+        return subprocess.run(["git", "-C", str(self.repo), "-c", "user.name=test", "-c", "user.email=t@t",
+                               *args], check=True, capture_output=True, text=True).stdout.strip()
+
+    def _commit(self, files) -> str:
+        for name, content in files.items():
+            path = self.repo / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", "change")
+        return self._git("rev-parse", "HEAD")
+
+    def test_commit_files_from_git(self):
+        sha = self._commit({"payments/app.py": "v2", "payments/new.py": "new"})
+        files = commit_files_from_git(self.repo, sha)
+        self.assertEqual(sorted((f.filename, f.status) for f in files),
+                         [("payments/app.py", "modified"), ("payments/new.py", "added")])
+
+    def test_root_commit_and_missing_commit(self):
+        root = self._git("rev-parse", "HEAD")
+        self.assertEqual(len(commit_files_from_git(self.repo, root)), 2)
+        self.assertIsNone(commit_files_from_git(self.repo, "0" * 40))
+
+    def test_pr_prefers_local_history(self):
+        base = self._git("rev-parse", "HEAD")
+        head = self._commit({"billing/app.py": "v2"})
+        event = {"pull_request": {"number": 7, "base": {"sha": base}, "head": {"sha": head}}}
+
+        modules, files = detect_changes("pr", ["payments", "billing"], self.client(), REPOSITORY,
+                                        event=event, repo_dir=self.repo)
+
+        self.assertEqual(modules, ["billing"])
+        self.assertEqual(files, [ChangedFile("billing/app.py", "modified")])
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Send Slack notifications to the actor of a workflow run and to Slack channels.
+
+A notification goes to the actor's Slack ID, read from the blog field of their
+GitHub profile, and/or to a channel looked up in slack_channel_mapping.json.
+When the actor has no Slack ID the notification goes to the slack-webhook-tests
+channel with a reminder to add it.
+
+Matrix legs can write their notification as a shard file instead of sending
+it. All shards of a run are then sent at once, grouped into one message per
+recipient, so a failure across 40 legs is one DM instead of 40. Actor
+profiles are looked up once per actor and cached on disk for a day, and
+messages to a channel are paced and retried according to Slack's rate limits.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+from github_api import GITHUB_API_URL, GitHubApiError, GitHubClient  # noqa: E402
+
+SLACK_API_URL = 'https://slack.com/api'
+
+MAPPING_FILE = Path(__file__).resolve().parent / 'slack_channel_mapping.json'
+
+# Actors that never get a direct message
+BOT_ACTORS = frozenset({'hawkai-bot', 'hawk-luca-ricchi'})
+
+FALLBACK_CHANNEL = 'slack-webhook-tests'
+
+MISSING_SLACK_ID_NOTE = ("There is no slack_id found in the profile. @{actor} please add it -> "
+                         "https://hawkai.atlassian.net/wiki/spaces/SRE/pages/3408363526/"
+                         "GitHub+Onboarding+Guide#4.-Personalize-your-profile")
+
+# Matrix legs named in an aggregated message, per distinct message
+MAX_LISTED_SHARDS = 10
+
+# chat.postMessage allows about one message per second per channel
+CHANNEL_INTERVAL = 1.0
+
+SLACK_RETRIES = 3
+
+# Seconds an actor's Slack ID is reused without asking GitHub again
+ACTOR_CACHE_TTL = 24 * 3600
+
+_channel_id_re = re.compile(r'^[CDGU][A-Z0-9]{6,}$')
+
+
+class SlackError(Exception):
+    pass
+
+
+@dataclass
+class Notification:
+    """What one action invocation (or matrix leg) asks to send."""
+    message: str
+    actor: str
+    repository: str
+    branch: str
+    run_url: str
+    notify_actor: bool = False
+    channel: str = ''
+    shard: str = ''
+
+    def write_shard(self, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(asdict(self), f)
+        path = directory / f"{self.shard or 'notification'}.json"
+        os.replace(temp_name, path)
+        return path
+
+    @classmethod
+    def read_shards(cls, directory: Path) -> List['Notification']:
+        return [cls(**json.loads(path.read_text())) for path in sorted(directory.rglob('*.json'))]
+
+
+@dataclass
+class OutgoingMessage:
+    """All notifications for one recipient, sent as a single Slack message."""
+    channel_id: str
+    label: str
+    notifications: List[Notification] = field(default_factory=list)
+    missing_slack_id: List[str] = field(default_factory=list)
+
+    def text(self) -> str:
+        first = self.notifications[0]
+        # The same message from several matrix legs is listed once with its legs
+        messages: Dict[str, List[str]] = {}
+        for notification in self.notifications:
+            messages.setdefault(notification.message, []).append(notification.shard)
+
+        parts = [f"[{first.repository}]"]
+        for message, shards in messages.items():
+            legs = [shard for shard in shards if shard]
+            if len(self.notifications) > 1 and legs:
+                listed = ', '.join(legs[:MAX_LISTED_SHARDS]) + (', ...' if len(legs) > MAX_LISTED_SHARDS else '')
+                message = f"{message} ({len(legs)} of {len(self.notifications)}: {listed})"
+            parts.append(f"{message} ")
+        text = '\n\n'.join(parts) + f"\n\n> branch-name: {first.branch}\n> <{first.run_url}|Github Link>\n\n"
+        for actor in dict.fromkeys(self.missing_slack_id):
+            text += f"\n---------------\n\n{MISSING_SLACK_ID_NOTE.format(actor=actor)}"
+        return text
+
+
+class RoutingIndex:
+    """
+    Channel name to ID lookup built once from slack_channel_mapping.json.
+    Names are matched case-insensitively with or without a leading '#', and
+    channel IDs are accepted as they are.
+    """
+
+    def __init__(self, mapping: Dict[str, str]):
+        self._channels = {self._key(name): channel_id for name, channel_id in mapping.items()}
+        self._names = {channel_id: name for name, channel_id in mapping.items()}
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return name.strip().lstrip('#').lower()
+
+    @classmethod
+    def load(cls, path: Path) -> 'RoutingIndex':
+        return cls(json.loads(path.read_text()))
+
+    def lookup(self, name: str) -> Tuple[str, str]:
+        """Return the channel ID and name of a channel name or ID."""
+        channel_id = self._channels.get(self._key(name))
+        if channel_id:
+            return channel_id, self._names[channel_id]
+        if _channel_id_re.match(name.strip()):
+            return name.strip(), self._names.get(name.strip(), name.strip())
+        raise KeyError(f"Slack channel '{name}' is not in {MAPPING_FILE.name}")
+
+
+class ActorDirectory:
+    """
+    Slack IDs of GitHub users, read from the blog field of their profile.
+    """
+
+    def __init__(self, client: GitHubClient):
+        self.client = client
+        self._ids: Dict[str, Optional[str]] = {}
+
+    def slack_id(self, actor: str) -> Optional[str]:
+        if actor not in self._ids:
+            try:
+                profile, _ = self.client.get(f"users/{actor}")
+                blog = (profile or {}).get('blog') or ''
+            except (GitHubApiError, OSError) as e:
+                print(f"Could not read the GitHub profile of {actor}: {e}")
+                blog = ''
+            self._ids[actor] = blog.strip() or None
+        return self._ids[actor]
+
+
+class SlackClient:
+    """
+    chat.postMessage client that paces messages per channel and retries
+    after the Retry-After delay on rate limits.
+    """
+
+    def __init__(self, token: str, api_url: str = SLACK_API_URL, channel_interval: float = CHANNEL_INTERVAL,
+                 retries: int = SLACK_RETRIES):
+        self.api_url = api_url.rstrip('/')
+        self.token = token
+        self.channel_interval = channel_interval
+        self.retries = retries
+        self.requests = 0
+        self._last_post: Dict[str, float] = {}
+
+    def post_message(self, channel: str, text: str) -> Dict:
+        last = self._last_post.get(channel)
+        if last is not None:
+            wait = last + self.channel_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+        data = json.dumps({'channel': channel, 'text': text}).encode()
+        for attempt in range(self.retries + 1):
+            request = Request(f"{self.api_url}/chat.postMessage", data=data, method='POST', headers={
+                'Authorization': f"Bearer {self.token}",
+                'Content-Type': 'application/json; charset=utf-8',
+            })
+            self.requests += 1
+            try:
+                with urlopen(request, timeout=30) as response:
+                    body = json.loads(response.read().decode('utf-8'))
+                break
+            except HTTPError as e:
+                if e.code != 429 or attempt == self.retries:
+                    raise SlackError(f"chat.postMessage to {channel} failed with HTTP {e.code}") from e
+                delay = float(e.headers.get('Retry-After', 1))
+                print(f"Slack rate limit reached, retrying in {delay:.0f}s")
+                time.sleep(delay)
+            except OSError as e:
+                # URLError, timeouts and connection resets
+                raise SlackError(f"chat.postMessage to {channel} failed: {e}") from e
+
+        self._last_post[channel] = time.monotonic()
+        if not body.get('ok'):
+            raise SlackError(f"chat.postMessage to {channel} failed: {body.get('error')}")
+        return body
+
+
+def route(notifications: Iterable[Notification], index: RoutingIndex,
+          actors: ActorDirectory) -> Tuple[List[OutgoingMessage], List[str]]:
+    """
+    Group the notifications by recipient, in the order recipients first
+    appear. Return the messages and the errors of the notifications whose
+    channel could not be resolved, the other recipients still get theirs.
+    """
+    outgoing: Dict[str, OutgoingMessage] = {}
+    errors: List[str] = []
+
+    def add(channel_id: str, label: str, notification: Notification) -> OutgoingMessage:
+        message = outgoing.setdefault(channel_id, OutgoingMessage(channel_id, label))
+        message.notifications.append(notification)
+        return message
+
+    for notification in notifications:
+        channel = notification.channel
+        missing_slack_id = False
+        if notification.notify_actor and notification.actor not in BOT_ACTORS:
+            slack_id = actors.slack_id(notification.actor)
+            if slack_id:
+                add(slack_id, notification.actor, notification)
+            else:
+                print(f"Slack user ID not found for GitHub user: {notification.actor}")
+                channel = FALLBACK_CHANNEL
+                missing_slack_id = True
+
+        if channel:
+            try:
+                channel_id, name = index.lookup(channel)
+            except KeyError as e:
+                error = e.args[0] + (f" (shard {notification.shard})" if notification.shard else '')
+                print(f"\033[0;31mError : {error}")
+                errors.append(error)
+                continue
+            message = add(channel_id, f"{name} channel", notification)
+            if missing_slack_id:
+                message.missing_slack_id.append(notification.actor)
+
+    return list(outgoing.values()), errors
+
+
+def send(messages: List[OutgoingMessage], slack: SlackClient) -> List[str]:
+    """Send every message, return the errors of those that failed."""
+    errors = []
+    for message in messages:
+        try:
+            slack.post_message(message.channel_id, message.text())
+            print(f"Slack notification sent successfully to {message.label} "
+                  f"({len(message.notifications)} notification(s)).")
+        except SlackError as e:
+            print(f"Failed to send Slack notification to {message.label}: {e}")
+            errors.append(str(e))
+    return errors
+
+
+def _notification_from_env(args: argparse.Namespace) -> Notification:
+    repository = os.environ.get('GITHUB_REPOSITORY', '')
+    server_url = os.environ.get('GITHUB_SERVER_URL', 'https://github.com')
+    ref = os.environ.get('GITHUB_REF', '')
+    return Notification(
+        # Messages are written with literal '\n' in the workflow files
+        message=args.message.replace('\\n', '\n'),
+        actor=os.environ.get('GITHUB_ACTOR', ''),
+        repository=repository,
+        branch=os.environ.get('GITHUB_HEAD_REF') or ref.removeprefix('refs/heads/'),
+        run_url=f"{server_url}/{repository}/actions/runs/{os.environ.get('GITHUB_RUN_ID', '')}",
+        notify_actor=args.notify_pr_author.lower() == 'true',
+        channel=args.channel,
+        shard=args.shard_name,
+    )
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Send Slack notifications for a workflow run')
+    parser.add_argument('--message', default='', help='Message of this notification')
+    parser.add_argument('--notify-pr-author', default='false', help='Send a direct message to the actor')
+    parser.add_argument('--channel', default='', help='Slack channel name from the mapping file, or a channel ID')
+    parser.add_argument('--shard-name', default='', help='Name of this matrix leg')
+    parser.add_argument('--write-shard', type=Path, metavar='DIR',
+                        help='Write the notification to DIR instead of sending it')
+    parser.add_argument('--send-shards', type=Path, metavar='DIR',
+                        help='Send the notifications of all shard files in DIR, one message per recipient')
+    parser.add_argument('--mapping', type=Path, default=MAPPING_FILE)
+    parser.add_argument('--cache-dir', type=Path, help='Directory for the GitHub API response cache')
+    parser.add_argument('--github-api-url', default=GITHUB_API_URL)
+    parser.add_argument('--slack-api-url', default=SLACK_API_URL)
+    args = parser.parse_args(argv[1:])
+
+    if args.send_shards:
+        notifications = Notification.read_shards(args.send_shards) if args.send_shards.is_dir() else []
+        print(f"Notification shards: {len(notifications)}")
+    else:
+        notifications = [_notification_from_env(args)]
+
+    if args.write_shard:
+        for notification in notifications:
+            print(f"Notification written to {notification.write_shard(args.write_shard)}")
+        return
+
+    github = GitHubClient(
+        token=os.environ.get('GITHUB_API_TOKEN', ''),
+        api_url=args.github_api_url,
+        cache_dir=args.cache_dir,
+        cache_ttl=ACTOR_CACHE_TTL,
+    )
+    messages, errors = route(notifications, RoutingIndex.load(args.mapping), ActorDirectory(github))
+
+    slack = SlackClient(os.environ.get('SLACK_TOKEN', ''), args.slack_api_url)
+    errors += send(messages, slack)
+    print(f"Slack messages: {len(messages)} for {len(notifications)} notification(s), "
+          f"{slack.requests} Slack request(s), {github.requests} GitHub request(s)")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
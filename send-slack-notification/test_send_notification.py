@@ -0,0 +1,185 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from urllib.error import URLError
+
+from send_notification import (ActorDirectory, GitHubClient, Notification, RoutingIndex, SlackClient, main, route,
+                               send)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+from github_stub import NOT_FOUND, GitHubStubHandler, start_server  # noqa: E402
+
+MAPPING = {"developers": "C014BJSF279", "slack-webhook-tests": "C04TY9PB1HT"}
+
+PROFILES = {"/users/alice": {"login": "alice", "blog": "U0ALICE1"}, "/users/bob": {"login": "bob", "blog": ""}}
+
+
+class StubHandler(GitHubStubHandler):
+    """Slack Web API and GitHub users API stand-in."""
+
+    def route(self, path, query):
+        profile = PROFILES.get(path)
+        return (200, profile, {}) if profile else NOT_FOUND
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.server.rate_limited:
+            self.server.rate_limited -= 1
+            self.send_json(429, {"ok": False, "error": "ratelimited"}, {"Retry-After": "3"})
+            return
+        self.server.posts.append(payload)
+        if payload["channel"] == "C0ARCHIVED":
+            self.send_json(200, {"ok": False, "error": "is_archived"})
+        else:
+            self.send_json(200, {"ok": True, "channel": payload["channel"], "ts": "1.0"})
+
+
+def notification(message="Build failed", actor="alice", shard="", **kwargs):
+    return Notification(message=message, actor=actor, repository="hawk-ai-aml/app", branch="main",
+                        run_url="https://github.com/hawk-ai-aml/app/actions/runs/1", shard=shard, **kwargs)
+
+
+class StubServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = start_server(self, StubHandler)
+        self.server.posts = []
+        self.server.rate_limited = 0
+        self.url = self.server.url
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def actors(self) -> ActorDirectory:
+        return ActorDirectory(GitHubClient(token="token", api_url=self.url))
+
+    def slack(self) -> SlackClient:
+        return SlackClient("xoxb-token", self.url, channel_interval=0)
+
+
+class TestRoutingIndex(unittest.TestCase):
+    def test_lookup(self):
+        index = RoutingIndex(MAPPING)
+        self.assertEqual(index.lookup("#Developers"), ("C014BJSF279", "developers"))
+        self.assertEqual(index.lookup("C04TY9PB1HT"), ("C04TY9PB1HT", "slack-webhook-tests"))
+        with self.assertRaises(KeyError):
+            index.lookup("unknown")
+
+
+class TestRoute(StubServerTestCase):
+    def test_matrix_legs_become_one_message_per_recipient(self):
+        notifications = [notification(shard=f"leg-{index}", notify_actor=True, channel="developers")
+                         for index in range(40)]
+        messages, _ = route(notifications, RoutingIndex(MAPPING), self.actors())
+
+        self.assertEqual([m.channel_id for m in messages], ["U0ALICE1", "C014BJSF279"])
+        self.assertEqual(self.server.requests, ["/users/alice"])
+
+        text = messages[0].text()
+        self.assertEqual(text.count("Build failed"), 1)
+        self.assertIn("(40 of 40: leg-0, leg-1,", text)
+        self.assertIn("> branch-name: main\n> <https://github.com/hawk-ai-aml/app/actions/runs/1|Github Link>", text)
+
+    def test_single_notification_keeps_the_message_format(self):
+        messages, _ = route([notification(notify_actor=True)], RoutingIndex(MAPPING), self.actors())
+        self.assertEqual(messages[0].text(), "[hawk-ai-aml/app]\n\nBuild failed \n\n> branch-name: main\n"
+                                             "> <https://github.com/hawk-ai-aml/app/actions/runs/1|Github Link>\n\n")
+
+    def test_missing_slack_id_falls_back_to_test_channel(self):
+        notifications = [notification(actor="bob", notify_actor=True), notification(actor="carol", notify_actor=True)]
+        messages, _ = route(notifications, RoutingIndex(MAPPING), self.actors())
+
+        self.assertEqual([m.channel_id for m in messages], ["C04TY9PB1HT"])
+        text = messages[0].text()
+        self.assertIn("@bob please add it", text)
+        self.assertIn("@carol please add it", text)
+
+    def test_bots_are_not_messaged(self):
+        messages, _ = route([notification(actor="hawkai-bot", notify_actor=True)], RoutingIndex(MAPPING), self.actors())
+        self.assertEqual(messages, [])
+        self.assertEqual(self.server.requests, [])
+
+    def test_unknown_channel_does_not_stop_other_recipients(self):
+        notifications = [notification(shard="leg-0", channel="developers"),
+                         notification(shard="leg-1", channel="develoeprs", notify_actor=True)]
+        messages, errors = route(notifications, RoutingIndex(MAPPING), self.actors())
+
+        self.assertEqual([m.channel_id for m in messages], ["C014BJSF279", "U0ALICE1"])
+        self.assertEqual(len(errors), 1)
+        self.assertIn("'develoeprs'", errors[0])
+        self.assertIn("leg-1", errors[0])
+
+
+class TestSend(StubServerTestCase):
+    def test_retries_after_rate_limit(self):
+        self.server.rate_limited = 2
+        messages, _ = route([notification(channel="developers")], RoutingIndex(MAPPING), self.actors())
+        slack = self.slack()
+        with mock.patch("send_notification.time.sleep") as sleep:
+            self.assertEqual(send(messages, slack), [])
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [3.0, 3.0])
+        self.assertEqual(slack.requests, 3)
+        self.assertEqual(len(self.server.posts), 1)
+
+    def test_paces_messages_to_the_same_channel(self):
+        slack = SlackClient("xoxb-token", self.url, channel_interval=5)
+        with mock.patch("send_notification.time.sleep") as sleep:
+            slack.post_message("C014BJSF279", "one")
+            slack.post_message("C04TY9PB1HT", "two")
+            slack.post_message("C014BJSF279", "three")
+        self.assertEqual(sleep.call_count, 1)
+        self.assertGreater(sleep.call_args.args[0], 4)
+
+    def test_reports_failures_and_sends_the_rest(self):
+        index = RoutingIndex({**MAPPING, "archived": "C0ARCHIVED"})
+        messages, _ = route([notification(channel="archived"), notification(channel="developers")], index,
+                            self.actors())
+        errors = send(messages, self.slack())
+        self.assertEqual(len(errors), 1)
+        self.assertIn("is_archived", errors[0])
+        self.assertEqual(len(self.server.posts), 2)
+
+    def test_reports_connection_errors_and_sends_the_rest(self):
+        messages, _ = route([notification(channel="developers"), notification(channel="slack-webhook-tests")],
+                            RoutingIndex(MAPPING), self.actors())
+        with mock.patch("send_notification.urlopen", side_effect=[URLError("refused"), TimeoutError("timed out")]):
+            errors = send(messages, self.slack())
+        self.assertEqual(len(errors), 2)
+        self.assertIn("refused", errors[0])
+        self.assertIn("timed out", errors[1])
+
+
+class TestMain(StubServerTestCase):
+    def test_writes_and_sends_shards(self):
+        shards = Path(self.tmp.name) / "shards"
+        env = {"GITHUB_ACTOR": "alice", "GITHUB_REPOSITORY": "hawk-ai-aml/app", "GITHUB_RUN_ID": "1",
+               "GITHUB_REF": "refs/heads/main", "SLACK_TOKEN": "xoxb-token"}
+        with mock.patch.dict("os.environ", env):
+            for leg in ("java-11", "java-17"):
+                main(["send_notification.py", "--notify-pr-author", "true", "--message", ":x: Build failed\\nfix it",
+                      "--shard-name", leg, "--write-shard", str(shards / leg)])
+            self.assertEqual(self.server.posts, [])
+
+            main(["send_notification.py", "--send-shards", str(shards), "--github-api-url", self.url,
+                  "--slack-api-url", self.url, "--cache-dir", str(Path(self.tmp.name) / "cache")])
+
+        self.assertEqual(len(self.server.posts), 1)
+        self.assertEqual(self.server.posts[0]["channel"], "U0ALICE1")
+        self.assertIn(":x: Build failed\nfix it (2 of 2: java-11, java-17)", self.server.posts[0]["text"])
+
+    def test_sends_the_other_shards_when_a_channel_is_unknown(self):
+        shards = Path(self.tmp.name) / "shards"
+        notification(shard="java-11", channel="developers").write_shard(shards)
+        notification(shard="java-17", channel="unknown").write_shard(shards)
+
+        with mock.patch.dict("os.environ", {"SLACK_TOKEN": "xoxb-token"}), self.assertRaises(SystemExit) as exited:
+            main(["send_notification.py", "--send-shards", str(shards), "--github-api-url", self.url,
+                  "--slack-api-url", self.url])
+
+        self.assertEqual(exited.exception.code, 1)
+        self.assertEqual([post["channel"] for post in self.server.posts], ["C014BJSF279"])
+
+
+if __name__ == '__main__':
+    unittest.main()
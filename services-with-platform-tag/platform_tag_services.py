@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Resolve the services and versions released with a platform tag.
+
+The tags of the kustomize repository are paginated concurrently and sorted by
+semantic version to find the tag preceding the platform tag. The commits
+between both tags are paginated the same way and every 'Update tag for X to Y'
+commit message is turned into a service@version entry, the latest version of
+a service winning. GitHub API calls go through the shared client in
+lib/github_api.py.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+from github_api import FETCH_WORKERS, GITHUB_API_URL, GitHubClient  # noqa: E402
+
+DEFAULT_REPOSITORY = 'hawk-ai-aml/kustomize'
+
+_semver_re = re.compile(r'^v?(\d+)\.(\d+)\.(\d+)(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$')
+_update_tag_re = re.compile(r'Update tag for (\S+) to (\d+\.\d+\.\d+\S*)')
+
+
+@dataclass(frozen=True, order=True)
+class SemVer:
+    major: int
+    minor: int
+    patch: int
+    # Releases sort after their pre-releases, pre-release identifiers compare numerically when possible
+    prerelease: Tuple[Tuple[int, int, str], ...]
+
+    @classmethod
+    def parse(cls, tag: str) -> Optional['SemVer']:
+        match = _semver_re.match(tag)
+        if not match:
+            return None
+        major, minor, patch, prerelease = match.groups()
+        if prerelease:
+            identifiers = tuple((0, int(p), '') if p.isdigit() else (1, 0, p) for p in prerelease.split('.'))
+        else:
+            identifiers = ((2, 0, ''),)
+        return cls(int(major), int(minor), int(patch), identifiers)
+
+
+def list_tags(client: GitHubClient, repository: str) -> List[str]:
+    return [tag['name'] for tag in client.paginate(f"repos/{repository}/tags")]
+
+
+def previous_tag(tags: List[str], tag: str) -> Optional[str]:
+    """Return the highest semantic version tag lower than tag."""
+    current = SemVer.parse(tag)
+    if current is None:
+        raise ValueError(f"Tag '{tag}' is not a semantic version")
+    versions = [(version, name) for name in tags if (version := SemVer.parse(name)) and version < current]
+    return max(versions)[1] if versions else None
+
+
+def compare_commits(client: GitHubClient, repository: str, base: str, head: str) -> List[Dict[str, Any]]:
+    """
+    Return all commits between base and head, oldest first. The first page
+    tells the total number of commits, the remaining pages are fetched
+    concurrently.
+    """
+    path = f"repos/{repository}/compare/{quote(base, safe='')}...{quote(head, safe='')}"
+    pages = client.get_pages(path, total=lambda body: body.get('total_commits', 0))
+    return [commit for page in pages for commit in page['commits']]
+
+
+def extract_services(commits: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Map every service updated by the commits to its latest version."""
+    services: Dict[str, str] = {}
+    for commit in commits:
+        for service, version in _update_tag_re.findall(commit['commit']['message']):
+            services.pop(service, None)
+            services[service] = version
+    return services
+
+
+def resolve_services(client: GitHubClient, repository: str, tag: str) -> Tuple[str, Dict[str, str]]:
+    tags = list_tags(client, repository)
+    if tag not in tags:
+        raise ValueError(f"Cannot find the tag '{tag}' in {repository}. Make sure the input tag is correct.")
+    previous = previous_tag(tags, tag)
+    if previous is None:
+        raise ValueError(f"Cannot find the previous tag of '{tag}'. Make sure the input tag is correct.")
+    return previous, extract_services(compare_commits(client, repository, previous, tag))
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Resolve the services released with a platform tag')
+    parser.add_argument('--tag', required=True, help='Platform tag')
+    parser.add_argument('--repository', default=DEFAULT_REPOSITORY)
+    parser.add_argument('--cache-dir', type=Path, help='Directory for the GitHub API response cache')
+    parser.add_argument('--api-url', default=GITHUB_API_URL)
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS)
+    args = parser.parse_args(argv[1:])
+
+    client = GitHubClient(
+        token=os.environ.get('REPOSITORY_ACCESS_TOKEN', ''),
+        user=os.environ.get('REPOSITORY_USER'),
+        api_url=args.api_url,
+        cache_dir=args.cache_dir,
+        workers=args.workers,
+    )
+
+    try:
+        previous, services = resolve_services(client, args.repository, args.tag)
+    except ValueError as e:
+        print(f"\033[0;31mError : {e}")
+        sys.exit(1)
+
+    print(f"Previous tag: {previous}")
+    print(f"API requests: {client.requests} ({client.cache_hits} served from cache)")
+    print(client.report())
+
+    outputs = {
+        'services': ' '.join(json.dumps(f"{service}@{version}") for service, version in services.items()),
+        'services-map': json.dumps(services, separators=(',', ':')),
+    }
+    lines = ''.join(f"{key}={value}\n" for key, value in outputs.items())
+    print(lines, end='')
+    for env_file in ('GITHUB_STEP_SUMMARY', 'GITHUB_OUTPUT'):
+        if os.environ.get(env_file):
+            with open(os.environ[env_file], 'a') as f:
+                f.write(lines)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,94 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from platform_tag_services import GitHubClient, SemVer, extract_services, previous_tag, resolve_services
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'lib'))
+from github_stub import NOT_FOUND, GitHubStubHandler, start_server  # noqa: E402
+
+REPOSITORY = "hawk-ai-aml/kustomize"
+
+# 250 tags over three pages, newest first as returned by the API, with the
+# previous tag of 2.1.0 on the last page
+TAGS = ["2.1.0", "latest"] + [f"1.{minor}.0" for minor in range(247)] + ["2.0.9"]
+
+
+def commit(message):
+    return {"sha": str(hash(message)), "commit": {"message": message}}
+
+
+COMMITS = [commit(f"AUTOMATIC COMMIT: Update tag for service-{index % 120} to 1.0.{index}") for index in range(230)]
+COMMITS.insert(10, commit("Merge branch 'main'"))
+
+
+class FixtureHandler(GitHubStubHandler):
+    def route(self, path, query):
+        if path == f"/repos/{REPOSITORY}/tags":
+            return self.page(path, query, [{"name": name} for name in TAGS])
+        if path == f"/repos/{REPOSITORY}/compare/2.0.9...2.1.0":
+            status, commits, _ = self.page(path, query, COMMITS)
+            return status, {"total_commits": len(COMMITS), "commits": commits}, {}
+        return NOT_FOUND
+
+
+class TestSemVer(unittest.TestCase):
+    def test_orders_prereleases_before_release(self):
+        tags = ["1.10.0", "v1.9.0", "1.10.0-rc.10", "1.10.0-rc.2", "latest"]
+        ordered = sorted((t for t in tags if SemVer.parse(t)), key=SemVer.parse)
+        self.assertEqual(ordered, ["v1.9.0", "1.10.0-rc.2", "1.10.0-rc.10", "1.10.0"])
+
+    def test_previous_tag(self):
+        tags = ["1.10.0", "1.9.0", "1.10.0-rc.1", "1.11.0", "latest"]
+        self.assertEqual(previous_tag(tags, "1.10.0"), "1.10.0-rc.1")
+        self.assertEqual(previous_tag(tags, "1.10.0-rc.1"), "1.9.0")
+        self.assertIsNone(previous_tag(tags, "1.9.0"))
+
+
+class TestExtractServices(unittest.TestCase):
+    def test_deduplicates_with_latest_version(self):
+        commits = [
+            commit("AUTOMATIC COMMIT: Update tag for payments to 1.2.3"),
+            commit("AUTOMATIC COMMIT: Update tag for billing to 2.0.0"),
+            commit("Fix typo"),
+            commit("AUTOMATIC COMMIT: Update tag for payments to 1.2.4-hotfix"),
+            commit("Update tag for accounts to latest"),
+        ]
+        self.assertEqual(extract_services(commits), {"billing": "2.0.0", "payments": "1.2.4-hotfix"})
+
+
+class TestResolveServices(unittest.TestCase):
+    def setUp(self):
+        self.server = start_server(self, FixtureHandler)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def client(self) -> GitHubClient:
+        return GitHubClient(token="token", api_url=self.server.url,
+                            cache_dir=Path(self.tmp.name) / "cache")
+
+    def test_reads_every_page_of_tags_and_commits(self):
+        client = self.client()
+        previous, services = resolve_services(client, REPOSITORY, "2.1.0")
+
+        self.assertEqual(previous, "2.0.9")
+        self.assertEqual(len(services), 120)
+        self.assertEqual(services["service-0"], "1.0.120")
+        self.assertEqual(services["service-119"], "1.0.119")
+        self.assertEqual(list(services)[-1], "service-109")
+        self.assertEqual(client.requests, 6)
+
+    def test_revalidates_cached_pages(self):
+        resolve_services(self.client(), REPOSITORY, "2.1.0")
+        client = self.client()
+        self.assertEqual(resolve_services(client, REPOSITORY, "2.1.0")[1]["service-0"], "1.0.120")
+        self.assertEqual(client.cache_hits, 6)
+
+    def test_unknown_tag(self):
+        with self.assertRaisesRegex(ValueError, "Cannot find the tag '3.0.0'"):
+            resolve_services(self.client(), REPOSITORY, "3.0.0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from validate_overlays import compute_keys, discover_overlays, parse_references, validate_overlays
+
+# Stand-in for the kustomize binary: fails for overlays containing a BROKEN file
+# and appends every built directory to the log file next to it
+FAKE_KUSTOMIZE = textwrap.dedent(f"""\
+    #!{sys.executable}
+    import sys
+    from pathlib import Path
+    if sys.argv[1] == 'version':
+        print('v5.0.0-fake')
+        sys.exit(0)
+    overlay = Path(sys.argv[2])
+    with open(Path(__file__).parent / 'builds.log', 'a') as log:
+        log.write(overlay.name + '\\n')
+    if (overlay / 'BROKEN').exists():
+        print(f'accumulating resources in {{overlay}}: broken', file=sys.stderr)
+        sys.exit(1)
+    print('kind: Deployment')
+    """)
+
+
+class TestValidateOverlays(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        tmp = Path(self.tmp.name)
+        self.root = tmp / "gitops"
+        self.cache_file = tmp / "cache" / "overlays.json"
+        self.kustomize = tmp / "bin" / "kustomize"
+        self.kustomize.parent.mkdir()
+        self.kustomize.write_text(FAKE_KUSTOMIZE)
+        self.kustomize.chmod(0o755)
+
+        self._write("base/kustomization.yaml", "resources:\n  - deployment.yaml\n")
+        self._write("base/deployment.yaml", "kind: Deployment\n")
+        self._write("components/monitoring/kustomization.yaml", "kind: Component\n")
+        self._write("common/labels.yaml", "app: test\n")
+        self._write("overlays/dev/kustomization.yaml", textwrap.dedent("""\
+            resources:
+              - ../../base
+            components: [../../components/monitoring]
+            patches:
+              - path: ../../common/labels.yaml
+            """))
+        self._write("overlays/prod/kustomization.yaml", "bases:\n  - ../../base\n")
+        self._write("overlays/sandbox/kustomization.yaml", "resources:\n  - https://github.com/org/repo?ref=v1\n")
+
+    def _write(self, relative: str, content: str) -> None:
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def _validate(self):
+        if (self.kustomize.parent / 'builds.log').exists():
+            os.remove(self.kustomize.parent / 'builds.log')
+        results = validate_overlays(self.root, str(self.kustomize), self.cache_file, workers=4)
+        return {result.overlay: result for result in results}
+
+    def _overlays(self):
+        overlays = discover_overlays(self.root)
+        for overlay in overlays.values():
+            parse_references(overlay, overlays)
+        return {str(path.relative_to(self.root)): overlay for path, overlay in overlays.items()}
+
+    def test_parses_dependency_graph(self):
+        overlays = self._overlays()
+        dev = overlays["overlays/dev"]
+        self.assertEqual([str(p.relative_to(self.root)) for p in dev.dependencies],
+                         ["base", "components/monitoring"])
+        self.assertEqual(dev.files, [self.root / "common" / "labels.yaml"])
+        self.assertTrue(overlays["components/monitoring"].is_component)
+        self.assertEqual(overlays["overlays/sandbox"].remote, ["https://github.com/org/repo?ref=v1"])
+
+    def test_keys_change_with_transitive_inputs(self):
+        before = compute_keys({o.path: o for o in self._overlays().values()})
+        self._write("base/deployment.yaml", "kind: StatefulSet\n")
+        after = compute_keys({o.path: o for o in self._overlays().values()})
+
+        changed = {str(path.relative_to(self.root)) for path in before if before[path] != after[path]}
+        self.assertEqual(changed, {"base", "overlays/dev", "overlays/prod"})
+
+    def test_builds_everything_except_components_first(self):
+        results = self._validate()
+        self.assertEqual(sorted(results), ["base", "overlays/dev", "overlays/prod", "overlays/sandbox"])
+        self.assertTrue(all(result.ok for result in results.values()))
+
+    def test_skips_unchanged_overlays(self):
+        self._validate()
+        # overlays/sandbox uses a remote input on a tag, which can move without the repository changing
+        self.assertEqual(sorted(self._validate()), ["overlays/sandbox"])
+
+        self._write("common/labels.yaml", "app: changed\n")
+        self.assertEqual(sorted(self._validate()), ["overlays/dev", "overlays/sandbox"])
+
+    def test_skips_remote_inputs_pinned_to_a_commit(self):
+        sha = "0123456789abcdef0123456789abcdef01234567"
+        self._write("overlays/sandbox/kustomization.yaml", textwrap.dedent(f"""\
+            resources:
+              - github.com/org/repo//deploy?ref={sha}
+              - https://github.com/org/other?timeout=90&ref={sha}
+            """))
+        self._write("overlays/qa/kustomization.yaml", "resources:\n  - github.com/org/repo//deploy?ref=main\n")
+        self._write("overlays/qa-eu/kustomization.yaml", "resources:\n  - ../qa\n")
+
+        self._validate()
+        self.assertEqual(sorted(self._validate()), ["overlays/qa", "overlays/qa-eu"])
+
+    def test_reports_all_failures_and_retries_them(self):
+        self._write("overlays/dev/BROKEN", "")
+        self._write("overlays/prod/BROKEN", "")
+
+        results = self._validate()
+        failures = sorted(name for name, result in results.items() if not result.ok)
+        self.assertEqual(failures, ["overlays/dev", "overlays/prod"])
+        self.assertIn("broken", results["overlays/dev"].output)
+
+        os.remove(self.root / "overlays" / "prod" / "BROKEN")
+        self.assertEqual(sorted(self._validate()), ["overlays/dev", "overlays/prod", "overlays/sandbox"])
+
+    def test_reference_cycles_are_always_built(self):
+        self._write("cycle/a/kustomization.yaml", "resources:\n  - ../b\n")
+        self._write("cycle/b/kustomization.yaml", "resources:\n  - ../a\n")
+        self._validate()
+        self.assertEqual(sorted(self._validate()), ["cycle/a", "cycle/b", "overlays/sandbox"])
+
+
+if __name__ == '__main__':
+    unittest.main()
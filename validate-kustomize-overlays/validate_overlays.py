@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Validate every kustomize overlay of a repository with 'kustomize build'.
+
+Overlays form a dependency graph through the directories they reference in
+resources, components and bases. Every overlay gets a key that hashes its own
+files, the local files it references and the keys of the overlays it depends
+on, so an overlay is only rebuilt when one of its transitive inputs changed
+since the last successful build. Remote inputs can change without the
+repository changing, so overlays using them are always built unless every
+remote input is pinned to a commit SHA. The remaining builds run in parallel
+and all failures are reported together.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+KUSTOMIZATION_FILES = ('kustomization.yaml', 'kustomization.yml', 'Kustomization')
+
+BUILD_WORKERS = os.cpu_count() or 1
+
+# Strips list markers, keys, quotes and 'key=' prefixes of generator entries
+_token_re = re.compile(r'^\s*(?:-\s*)?(?:[A-Za-z0-9_]+:\s+)?["\']?(?:[A-Za-z0-9_.-]+=)?([^"\'\s#]+)["\']?\s*(?:#.*)?$')
+_remote_re = re.compile(r'^(?:https?://|git@|ssh://|github\.com/)')
+_component_re = re.compile(r'^kind:\s*Component\s*$', re.MULTILINE)
+# Remote inputs whose ref is a full commit SHA always resolve to the same content
+_pinned_ref_re = re.compile(r'[?&](?:ref|version)=(?:[0-9a-f]{40}|[0-9a-f]{64})(?:&|$)')
+
+
+@dataclass
+class Overlay:
+    path: Path
+    kustomization: Path
+    is_component: bool = False
+    dependencies: List[Path] = field(default_factory=list)
+    files: List[Path] = field(default_factory=list)
+    remote: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BuildResult:
+    overlay: str
+    ok: bool
+    output: str = ''
+
+
+def _kustomization_file(directory: Path) -> Optional[Path]:
+    for name in KUSTOMIZATION_FILES:
+        if (directory / name).is_file():
+            return directory / name
+    return None
+
+
+def discover_overlays(root: Path) -> Dict[Path, Overlay]:
+    overlays: Dict[Path, Overlay] = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        directory = Path(dirpath).resolve()
+        kustomization = _kustomization_file(directory)
+        if kustomization:
+            overlays[directory] = Overlay(directory, kustomization)
+    return overlays
+
+
+def parse_references(overlay: Overlay, overlays: Dict[Path, Overlay]) -> None:
+    """
+    Collect what an overlay references from its kustomization file. Every value
+    that resolves to a path is a reference: directories with a kustomization are
+    dependencies, other local paths are input files, URLs are remote inputs.
+    """
+    text = overlay.kustomization.read_text()
+    overlay.is_component = bool(_component_re.search(text))
+    for line in text.splitlines():
+        if line.lstrip().startswith('#'):
+            continue
+        # Flow lists like 'resources: [../base, service.yaml]'
+        values = re.findall(r'[^\[\],\s]+', line.split('[', 1)[1]) if '[' in line else []
+        match = _token_re.match(line)
+        if match:
+            values.append(match.group(1))
+
+        for value in values:
+            value = value.strip('"\'')
+            if _remote_re.match(value):
+                overlay.remote.append(value)
+                continue
+            try:
+                target = (overlay.path / value).resolve()
+            except (OSError, ValueError):
+                continue
+            if overlay.path.is_relative_to(target) or not target.exists():
+                continue
+            if target in overlays:
+                overlay.dependencies.append(target)
+            elif target.is_dir():
+                overlay.files.extend(p for p in sorted(target.rglob('*')) if p.is_file())
+            elif not target.is_relative_to(overlay.path):
+                overlay.files.append(target)
+
+
+def _own_files(overlay: Overlay, overlays: Dict[Path, Overlay]) -> List[Path]:
+    """Files below the overlay directory, excluding nested overlays."""
+    files: List[Path] = []
+    for dirpath, dirs, names in os.walk(overlay.path):
+        directory = Path(dirpath)
+        dirs[:] = sorted(d for d in dirs if (directory / d).resolve() not in overlays)
+        files.extend(directory / name for name in sorted(names))
+    return files
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_keys(overlays: Dict[Path, Overlay], salt: str = '') -> Dict[Path, str]:
+    """
+    Return the content key of every overlay. Overlays in a reference cycle get
+    no key and are always built, so kustomize reports the cycle. The same goes
+    for overlays with a remote input not pinned to a commit SHA, and for every
+    overlay depending on one of those.
+    """
+    keys: Dict[Path, str] = {}
+    visiting: Set[Path] = set()
+    digests: Dict[Path, str] = {}
+
+    def digest(path: Path) -> str:
+        if path not in digests:
+            digests[path] = _file_digest(path)
+        return digests[path]
+
+    def key(path: Path) -> Optional[str]:
+        if path in keys:
+            return keys[path]
+        if path in visiting:
+            return None
+        overlay = overlays[path]
+        if not all(_pinned_ref_re.search(remote) for remote in overlay.remote):
+            return None
+        visiting.add(path)
+        hasher = hashlib.sha256(salt.encode())
+        for file in sorted(set(_own_files(overlay, overlays) + overlay.files)):
+            hasher.update(f"{os.path.relpath(file, path)}\0{digest(file)}\0".encode())
+        for remote in overlay.remote:
+            hasher.update(f"{remote}\0".encode())
+        for dependency in overlay.dependencies:
+            dependency_key = key(dependency)
+            if dependency_key is None:
+                visiting.discard(path)
+                return None
+            hasher.update(f"{os.path.relpath(dependency, path)}\0{dependency_key}\0".encode())
+        visiting.discard(path)
+        keys[path] = hasher.hexdigest()
+        return keys[path]
+
+    for path in overlays:
+        key(path)
+    return keys
+
+
+def build_overlay(kustomize: str, overlay: Path, root: Path) -> BuildResult:
+    name = str(overlay.relative_to(root)) if overlay != root else '.'
+    result = subprocess.run([kustomize, 'build', str(overlay)], capture_output=True, text=True)
+    return BuildResult(name, result.returncode == 0, result.stderr.strip())
+
+
+def load_cache(cache_file: Optional[Path]) -> Dict[str, str]:
+    if not cache_file or not cache_file.exists():
+        return {}
+    try:
+        return json.loads(cache_file.read_text())
+    except ValueError:
+        return {}
+
+
+def save_cache(cache_file: Path, cache: Dict[str, str]) -> None:
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=cache_file.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(temp_name, cache_file)
+
+
+def kustomize_version(kustomize: str) -> str:
+    result = subprocess.run([kustomize, 'version'], capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def validate_overlays(root: Path, kustomize: str = 'kustomize', cache_file: Optional[Path] = None,
+                      workers: int = BUILD_WORKERS) -> List[BuildResult]:
+    """
+    Build every overlay below root whose inputs changed since its last
+    successful build and return the results of the builds that ran.
+    """
+    root = root.resolve()
+    overlays = discover_overlays(root)
+    for overlay in overlays.values():
+        parse_references(overlay, overlays)
+
+    keys = compute_keys(overlays, salt=kustomize_version(kustomize))
+    cache = load_cache(cache_file)
+
+    def cache_name(path: Path) -> str:
+        return str(path.relative_to(root))
+
+    # Components can only be built through the overlays that include them
+    pending = [path for path, overlay in overlays.items()
+               if not overlay.is_component and (path not in keys or cache.get(cache_name(path)) != keys[path])]
+    print(f"Overlays: {len(overlays)}, unchanged: {len(overlays) - len(pending)}, to build: {len(pending)}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda path: build_overlay(kustomize, path, root), pending))
+
+    if cache_file:
+        for path, result in zip(pending, results):
+            if result.ok and path in keys:
+                cache[cache_name(path)] = keys[path]
+            else:
+                cache.pop(cache_name(path), None)
+        save_cache(cache_file, cache)
+    return results
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Validate kustomize overlays with kustomize build')
+    parser.add_argument('root', nargs='?', default='.', type=Path, help='Repository root to search for overlays')
+    parser.add_argument('--kustomize', default='kustomize', help='kustomize binary')
+    parser.add_argument('--cache-file', type=Path, help='File with the keys of the last successful builds')
+    parser.add_argument('--workers', type=int, default=BUILD_WORKERS)
+    args = parser.parse_args(argv[1:])
+
+    results = validate_overlays(args.root, args.kustomize, args.cache_file, args.workers)
+    failures = [result for result in results if not result.ok]
+
+    summary = [f"Built {len(results)} overlays, {len(failures)} failed"]
+    for failure in failures:
+        summary.append(f"\n### {failure.overlay}\n```\n{failure.output}\n```")
+    print('\n'.join(summary))
+    if os.environ.get('GITHUB_STEP_SUMMARY'):
+        with open(os.environ['GITHUB_STEP_SUMMARY'], 'a') as f:
+            f.write('\n'.join(summary) + '\n')
+
+    if failures:
+        print(f"Error detected in paths: {' '.join(failure.overlay for failure in failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)